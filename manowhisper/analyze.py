@@ -0,0 +1,152 @@
+"""
+Run any subset of the hate, misogyny and emotion classifiers over a corpus in
+a single pass.
+
+Each transcript is parsed once and every selected model scores the same
+in-memory captions, so all scores land in one CSV.
+
+Usage:
+    python -m manowhisper.analyze --shows "/data/Tate Speech/vtt" scores.csv
+"""
+
+import csv
+import os
+
+import click
+from alive_progress import alive_bar
+
+from manowhisper.backends import BACKENDS
+from manowhisper.cache import open_cache
+from manowhisper.corpus import list_transcripts
+from manowhisper.inference import DEFAULT_BATCH_SIZE, classify_batched
+from manowhisper.models import EMOTION_LABELS, MODELS, load_pipeline
+from manowhisper.segment import SEGMENT_MODES, read_segments
+
+
+def score_columns(models):
+    """Output columns contributed by the selected models."""
+    columns = []
+    for name in models:
+        if name == "emotion":
+            columns.extend(f"emotion_{label}" for label in EMOTION_LABELS)
+        else:
+            columns.extend([f"{name}_label", f"{name}_score"])
+    return columns
+
+
+def score_values(name, result):
+    """Flatten one model's result for a caption into output values."""
+    if name == "emotion":
+        scores = {entry["label"]: entry["score"] for entry in result}
+        return [round(scores.get(label, 0), 4) for label in EMOTION_LABELS]
+    return [result[0]["label"], round(result[0]["score"], 4)]
+
+
+def analyze_file(
+    filepath, pipelines, batch_size=DEFAULT_BATCH_SIZE, cache=None, segment="caption"
+):
+    """Parse a transcript once and score it with every pipeline."""
+    texts, starts, ends = read_segments(filepath, segment)
+    results = {
+        name: classify_batched(texts, model_pipeline, batch_size, cache=cache)
+        for name, model_pipeline in pipelines.items()
+    }
+    rows = []
+    for i, (start, end) in enumerate(zip(starts, ends)):
+        row = [start, end]
+        for name in pipelines:
+            row.extend(score_values(name, results[name][i]))
+        rows.append(row)
+    return rows
+
+
+def analyze_shows(
+    shows,
+    output_csv,
+    models,
+    batch_size=DEFAULT_BATCH_SIZE,
+    use_cache=True,
+    backend="torch",
+    segment="caption",
+):
+    """Score every caption of every show and write all scores to one CSV."""
+    pipelines = {name: load_pipeline(name, backend) for name in models}
+    cache = open_cache(use_cache)
+
+    with open(output_csv, "w", newline="", encoding="utf-8") as csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(["show", "filename", "start", "end", *score_columns(models)])
+
+        for show_path in shows:
+            show_name = os.path.basename(os.path.dirname(show_path))
+            vtt_files = list_transcripts(show_path)
+            with alive_bar(len(vtt_files), title=show_name) as bar:
+                for filepath in vtt_files:
+                    for row in analyze_file(
+                        filepath, pipelines, batch_size, cache, segment
+                    ):
+                        writer.writerow([show_name, filepath, *row])
+                    bar()
+
+    print(f"Saved CSV to {output_csv}")
+    if cache:
+        print(cache.stats())
+        cache.close()
+
+
+@click.command()
+@click.option(
+    "--shows",
+    multiple=True,
+    required=True,
+    type=click.Path(exists=True),
+    help="Paths to VTT folders",
+)
+@click.option(
+    "--models",
+    "-m",
+    default=",".join(MODELS),
+    show_default=True,
+    help="Comma-separated list of models to run",
+)
+@click.option(
+    "--batch-size",
+    default=DEFAULT_BATCH_SIZE,
+    show_default=True,
+    help="Sentences per model forward pass",
+)
+@click.option(
+    "--cache/--no-cache",
+    default=True,
+    show_default=True,
+    help="Reuse scores from the shared classification cache",
+)
+@click.option(
+    "--backend",
+    type=click.Choice(BACKENDS),
+    default="torch",
+    show_default=True,
+    help="CPU inference backend",
+)
+@click.option(
+    "--segment",
+    type=click.Choice(SEGMENT_MODES),
+    default="caption",
+    show_default=True,
+    help="Classify captions as-is, or merged into sentences",
+)
+@click.argument("output_csv", type=click.Path())
+def main(shows, models, batch_size, cache, backend, segment, output_csv):
+    """Classify VTT directories with several models in one pass."""
+    models = [name.strip() for name in models.split(",") if name.strip()]
+    unknown = [name for name in models if name not in MODELS]
+    if unknown:
+        raise click.BadParameter(
+            f"Unknown model(s): {', '.join(unknown)}. Choose from {', '.join(MODELS)}.",
+            param_hint="--models",
+        )
+    analyze_shows(shows, output_csv, models, batch_size, cache, backend, segment)
+
+
+if __name__ == "__main__":
+    main()
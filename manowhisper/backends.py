@@ -0,0 +1,184 @@
+"""
+CPU inference backends for the classification pipelines.
+
+    torch       eager fp32 PyTorch, as loaded by transformers.
+    torch-int8  dynamic int8 quantization of every Linear layer.
+    onnx        ONNX Runtime through optimum.
+
+Quantized weights and ONNX exports are written once under the artifact
+directory and reused on later runs. Use the parity command to measure how far
+a backend's scores drift from fp32 before trusting it on a corpus:
+
+    python -m manowhisper.backends --model hate --backend onnx "/data/Tate Speech/vtt"
+"""
+
+import os
+import random
+import re
+
+import click
+
+BACKENDS = ["torch", "torch-int8", "onnx"]
+
+ARTIFACT_DIR = os.environ.get(
+    "MANOWHISPER_ARTIFACTS",
+    os.path.join(os.path.expanduser("~"), ".cache", "manowhisper", "models"),
+)
+
+
+def artifact_path(model_name, backend):
+    """Directory holding a model's exported artifacts for a backend."""
+    safe_name = re.sub(r"[^A-Za-z0-9._-]+", "--", model_name)
+    return os.path.join(ARTIFACT_DIR, safe_name, backend)
+
+
+def load_int8_model(model_name):
+    """Load a dynamically quantized model, quantizing and caching it once."""
+    import torch
+    from transformers import AutoConfig, AutoModelForSequenceClassification
+
+    path = artifact_path(model_name, "torch-int8")
+    weights = os.path.join(path, "model.pt")
+
+    if os.path.exists(weights):
+        # Rebuild the quantized graph from the config alone, then restore
+        # the cached int8 weights without touching the fp32 checkpoint.
+        config = AutoConfig.from_pretrained(model_name)
+        model = AutoModelForSequenceClassification.from_config(config)
+        model = torch.quantization.quantize_dynamic(
+            model, {torch.nn.Linear}, dtype=torch.qint8
+        )
+        model.load_state_dict(torch.load(weights, weights_only=False))
+    else:
+        model = AutoModelForSequenceClassification.from_pretrained(model_name)
+        model = torch.quantization.quantize_dynamic(
+            model, {torch.nn.Linear}, dtype=torch.qint8
+        )
+        os.makedirs(path, exist_ok=True)
+        torch.save(model.state_dict(), weights)
+
+    model.eval()
+    return model
+
+
+def load_onnx_model(model_name):
+    """Load an ONNX Runtime model, exporting and caching it once."""
+    from optimum.onnxruntime import ORTModelForSequenceClassification
+
+    path = artifact_path(model_name, "onnx")
+    if os.path.exists(os.path.join(path, "config.json")):
+        return ORTModelForSequenceClassification.from_pretrained(path)
+
+    model = ORTModelForSequenceClassification.from_pretrained(model_name, export=True)
+    model.save_pretrained(path)
+    return model
+
+
+def build_pipeline(task, model_name, backend="torch", **kwargs):
+    """Build a transformers pipeline for model_name on the given backend."""
+    # Imported here so scripts that talk to the inference server never pay
+    # for loading transformers.
+    from transformers import AutoTokenizer, pipeline
+
+    if backend == "torch":
+        model_pipeline = pipeline(task, model=model_name, **kwargs)
+    elif backend in ("torch-int8", "onnx"):
+        if backend == "torch-int8":
+            model = load_int8_model(model_name)
+        else:
+            model = load_onnx_model(model_name)
+        tokenizer = AutoTokenizer.from_pretrained(model_name)
+        model_pipeline = pipeline(task, model=model, tokenizer=tokenizer, **kwargs)
+    else:
+        raise ValueError(f"Unknown backend: {backend}. Choose from {BACKENDS}.")
+
+    # Recorded so cached scores are never shared between backends.
+    model_pipeline.model_id = model_name
+    model_pipeline.backend = backend
+    return model_pipeline
+
+
+def label_scores(result):
+    """Map a top_k=None pipeline result to {label: score}."""
+    return {entry["label"]: entry["score"] for entry in result}
+
+
+def check_parity(reference, candidate, texts, batch_size=32):
+    """
+    Compare a candidate pipeline's scores with an fp32 reference.
+
+    Both pipelines must return every label (top_k=None). Returns the share of
+    texts whose top label agrees, and the mean, 95th percentile and maximum
+    absolute score drift across all labels.
+    """
+    from manowhisper.inference import classify_batched
+
+    expected = classify_batched(texts, reference, batch_size)
+    actual = classify_batched(texts, candidate, batch_size)
+
+    drifts = []
+    agree = 0
+    for ref, cand in zip(expected, actual):
+        ref, cand = label_scores(ref), label_scores(cand)
+        drifts.extend(abs(ref[label] - cand.get(label, 0)) for label in ref)
+        agree += max(ref, key=ref.get) == max(cand, key=cand.get)
+
+    drifts.sort()
+    return {
+        "agreement": agree / len(texts) if texts else 1.0,
+        "mean_drift": sum(drifts) / len(drifts) if drifts else 0.0,
+        "p95_drift": drifts[int(0.95 * (len(drifts) - 1))] if drifts else 0.0,
+        "max_drift": drifts[-1] if drifts else 0.0,
+    }
+
+
+@click.command()
+@click.option(
+    "--model",
+    "-m",
+    "model_key",
+    required=True,
+    help="Registered model name (hate, misogyny, emotion) or a model id",
+)
+@click.option(
+    "--backend",
+    type=click.Choice(BACKENDS[1:]),
+    required=True,
+    help="Backend to compare against eager fp32",
+)
+@click.option(
+    "--sample",
+    default=500,
+    show_default=True,
+    help="Number of captions to sample",
+)
+@click.option("--seed", default=0, show_default=True, help="Random seed")
+@click.argument("vtt_path", type=click.Path(exists=True))
+def main(model_key, backend, sample, seed, vtt_path):
+    """Report score drift of a backend against fp32 on sampled captions."""
+    from manowhisper.corpus import list_transcripts, read_transcript
+    from manowhisper.models import MODELS
+
+    model_name = MODELS.get(model_key, model_key)
+
+    texts = []
+    for filepath in list_transcripts(vtt_path):
+        texts.extend(read_transcript(filepath, skip_empty=True).texts)
+    random.Random(seed).shuffle(texts)
+    texts = texts[:sample]
+
+    reference = build_pipeline("text-classification", model_name, top_k=None)
+    candidate = build_pipeline(
+        "text-classification", model_name, backend=backend, top_k=None
+    )
+    report = check_parity(reference, candidate, texts)
+
+    print(f"{model_name}: {backend} vs torch fp32 on {len(texts):,} captions")
+    print(f"  Top label agreement: {report['agreement']:.2%}")
+    print(f"  Mean score drift:    {report['mean_drift']:.5f}")
+    print(f"  95th pct drift:      {report['p95_drift']:.5f}")
+    print(f"  Max score drift:     {report['max_drift']:.5f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+"""
+Persistent, content-addressed cache of classification results.
+
+Results are keyed by (model id, model revision, normalized text hash), so a
+caption scored by any script is never sent through the same model twice.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import time
+import unicodedata
+
+DEFAULT_CACHE_PATH = os.environ.get(
+    "MANOWHISPER_CACHE",
+    os.path.join(os.path.expanduser("~"), ".cache", "manowhisper", "scores.sqlite"),
+)
+DEFAULT_MAX_BYTES = 2 * 1024**3
+
+# Stay well below SQLite's bound-parameter limit.
+LOOKUP_CHUNK_SIZE = 500
+
+
+def normalize_text(text):
+    """Normalize unicode and whitespace so trivial variants share a key."""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def text_hash(text):
+    """Hash the normalized form of text."""
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+def pipeline_identity(model_pipeline):
+    """
+    Return the (model id, revision) pair identifying a pipeline's outputs.
+
+    The model id includes the task and top_k setting, since they change the
+    shape of the returned scores, and any non-default inference backend,
+    since quantized or exported models drift slightly from fp32.
+    """
+    if isinstance(getattr(model_pipeline, "identity", None), tuple):
+        # Pipelines served by the inference daemon report its identity.
+        return model_pipeline.identity
+
+    model = model_pipeline.model
+    params = getattr(model_pipeline, "_postprocess_params", {}) or {}
+    top_k = params.get("top_k", "default")
+    name = getattr(model_pipeline, "model_id", None) or model.config._name_or_path
+    model_id = f"{name}:{model_pipeline.task}:top_k={top_k}"
+    backend = getattr(model_pipeline, "backend", "torch")
+    if backend != "torch":
+        model_id = f"{model_id}:{backend}"
+    revision = getattr(model.config, "_commit_hash", None) or "unknown"
+    return model_id, revision
+
+
+class ScoreCache:
+    """SQLite-backed store of pipeline outputs with LRU size eviction."""
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_bytes=DEFAULT_MAX_BYTES):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.conn = sqlite3.connect(path, timeout=60)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS scores (
+                model TEXT NOT NULL,
+                revision TEXT NOT NULL,
+                text_hash TEXT NOT NULL,
+                result TEXT NOT NULL,
+                accessed REAL NOT NULL,
+                PRIMARY KEY (model, revision, text_hash)
+            )
+            """)
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS scores_accessed ON scores (accessed)"
+        )
+        self.conn.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def get_many(self, model_id, revision, hashes):
+        """Return a dict of text hash to cached result for the given hashes."""
+        unique = list(dict.fromkeys(hashes))
+        found = {}
+        for i in range(0, len(unique), LOOKUP_CHUNK_SIZE):
+            chunk = unique[i : i + LOOKUP_CHUNK_SIZE]
+            placeholders = ",".join("?" * len(chunk))
+            rows = self.conn.execute(
+                "SELECT text_hash, result FROM scores "
+                "WHERE model = ? AND revision = ? "
+                f"AND text_hash IN ({placeholders})",
+                [model_id, revision, *chunk],
+            )
+            for key, result in rows:
+                found[key] = json.loads(result)
+
+        if found:
+            now = time.time()
+            self.conn.executemany(
+                "UPDATE scores SET accessed = ? WHERE model = ? AND revision = ? "
+                "AND text_hash = ?",
+                [(now, model_id, revision, key) for key in found],
+            )
+            self.conn.commit()
+
+        self.hits += sum(1 for key in hashes if key in found)
+        self.misses += sum(1 for key in hashes if key not in found)
+        return found
+
+    def put_many(self, model_id, revision, items):
+        """Store (text hash, result) pairs, evicting old entries if needed."""
+        now = time.time()
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO scores VALUES (?, ?, ?, ?, ?)",
+            [
+                (model_id, revision, key, json.dumps(result), now)
+                for key, result in items
+            ],
+        )
+        self.conn.commit()
+        self.evict()
+
+    def size_bytes(self):
+        """Bytes used by live pages in the database file."""
+        page_size = self.conn.execute("PRAGMA page_size").fetchone()[0]
+        page_count = self.conn.execute("PRAGMA page_count").fetchone()[0]
+        free_pages = self.conn.execute("PRAGMA freelist_count").fetchone()[0]
+        return (page_count - free_pages) * page_size
+
+    def evict(self):
+        """Drop least recently used entries until the cache fits max_bytes."""
+        size = self.size_bytes()
+        if not self.max_bytes or size <= self.max_bytes:
+            return 0
+
+        count = self.conn.execute("SELECT COUNT(*) FROM scores").fetchone()[0]
+        # Free an extra tenth so eviction does not run on every insert.
+        target = self.max_bytes * 0.9
+        to_delete = max(1, int(count * (size - target) / size))
+        self.conn.execute(
+            "DELETE FROM scores WHERE rowid IN "
+            "(SELECT rowid FROM scores ORDER BY accessed LIMIT ?)",
+            (to_delete,),
+        )
+        self.conn.commit()
+        return to_delete
+
+    def stats(self):
+        """Summarize hit/miss counters for this session."""
+        total = self.hits + self.misses
+        rate = self.hits / total if total else 0
+        return (
+            f"Cache: {self.hits:,} hits, {self.misses:,} misses ({rate:.1%} hit rate)"
+        )
+
+    def close(self):
+        self.conn.close()
+
+
+def open_cache(enabled=True):
+    """Open the shared score cache, or return None when caching is disabled."""
+    return ScoreCache() if enabled else None
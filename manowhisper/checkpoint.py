@@ -0,0 +1,179 @@
+"""
+Per-file checkpoints for long classification runs.
+
+A run directory holds:
+
+    run.json        options that affect results (model, backend, ...)
+    manifest.jsonl  one line per finished transcript: its path, version
+                    (mtime and size), and the byte range of its rows
+    shard-NNNN.csv  rows written by each session, without a header
+
+Rows reach disk, and are fsynced, before their manifest line, so a crash
+loses at most the transcript in progress. Rerunning with the same options
+skips every transcript whose version is unchanged, which also means only new
+or edited episodes are classified on later runs. The final output is
+assembled from the shards in the order of the current file list.
+"""
+
+import csv
+import io
+import json
+import os
+import shutil
+
+from manowhisper.corpus import transcript_version
+
+RUN_FILE = "run.json"
+MANIFEST = "manifest.jsonl"
+COPY_CHUNK_SIZE = 1 << 20
+
+
+def default_run_dir(output_path):
+    """Checkpoints live beside the output, e.g. "scores.csv.parts"."""
+    return f"{output_path}.parts"
+
+
+class Checkpoint:
+    def __init__(self, run_dir, options, resume=True):
+        self.run_dir = run_dir
+        self.options = options
+        self.done = {}
+
+        if not resume or self.load_options() != options:
+            if os.path.exists(run_dir):
+                print(f"Starting a new run in {run_dir}")
+                shutil.rmtree(run_dir)
+        os.makedirs(run_dir, exist_ok=True)
+        with open(os.path.join(run_dir, RUN_FILE), "w", encoding="utf-8") as f:
+            json.dump(options, f, sort_keys=True)
+
+        self.load_manifest()
+        self.repair_shards()
+
+        shard_numbers = [int(name[6:10]) for name in self.shard_names()]
+        self.shard_name = f"shard-{max(shard_numbers, default=-1) + 1:04d}.csv"
+        self.shard = open(os.path.join(run_dir, self.shard_name), "ab")
+        self.manifest = open(os.path.join(run_dir, MANIFEST), "a", encoding="utf-8")
+
+    def load_options(self):
+        try:
+            with open(os.path.join(self.run_dir, RUN_FILE), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def load_manifest(self):
+        path = os.path.join(self.run_dir, MANIFEST)
+        if not os.path.exists(path):
+            return
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # A line cut short by a crash.
+                    continue
+                # Later entries replace earlier ones for re-classified files.
+                self.done[entry["path"]] = entry
+
+    def shard_names(self):
+        return sorted(
+            name
+            for name in os.listdir(self.run_dir)
+            if name.startswith("shard-") and name.endswith(".csv")
+        )
+
+    def repair_shards(self):
+        """Drop rows written after the last manifest line of each shard."""
+        committed = {}
+        for entry in self.done.values():
+            committed[entry["shard"]] = max(
+                committed.get(entry["shard"], 0), entry["end"]
+            )
+        for name in self.shard_names():
+            path = os.path.join(self.run_dir, name)
+            if name not in committed:
+                os.remove(path)
+            elif os.path.getsize(path) > committed[name]:
+                with open(path, "r+b") as f:
+                    f.truncate(committed[name])
+
+    def is_done(self, path):
+        entry = self.done.get(path)
+        return entry is not None and entry["version"] == list(transcript_version(path))
+
+    def record(self, path, rows):
+        """Durably store a finished transcript's rows."""
+        buffer = io.StringIO()
+        csv.writer(buffer, lineterminator="\n").writerows(rows)
+        data = buffer.getvalue().encode("utf-8")
+
+        start = self.shard.tell()
+        self.shard.write(data)
+        self.shard.flush()
+        os.fsync(self.shard.fileno())
+
+        entry = {
+            "path": path,
+            "version": list(transcript_version(path)),
+            "shard": self.shard_name,
+            "start": start,
+            "end": start + len(data),
+        }
+        self.manifest.write(json.dumps(entry) + "\n")
+        self.manifest.flush()
+        os.fsync(self.manifest.fileno())
+        self.done[path] = entry
+
+    def read_bytes(self, path, shards):
+        entry = self.done[path]
+        if entry["shard"] not in shards:
+            shards[entry["shard"]] = open(
+                os.path.join(self.run_dir, entry["shard"]), "rb"
+            )
+        shard = shards[entry["shard"]]
+        shard.seek(entry["start"])
+        remaining = entry["end"] - entry["start"]
+        while remaining:
+            chunk = shard.read(min(remaining, COPY_CHUNK_SIZE))
+            remaining -= len(chunk)
+            yield chunk
+
+    def iter_rows(self, paths):
+        """Yield the stored rows of each finished transcript, in order."""
+        shards = {}
+        try:
+            for path in paths:
+                if path in self.done:
+                    text = b"".join(self.read_bytes(path, shards)).decode("utf-8")
+                    yield from csv.reader(io.StringIO(text))
+        finally:
+            for shard in shards.values():
+                shard.close()
+
+    def assemble(self, paths, output_csv, header):
+        """Write a CSV of every finished transcript's rows, in path order."""
+        self.shard.flush()
+        shards = {}
+        try:
+            with open(output_csv, "wb") as output:
+                buffer = io.StringIO()
+                csv.writer(buffer, lineterminator="\n").writerow(header)
+                output.write(buffer.getvalue().encode("utf-8"))
+                for path in paths:
+                    if path in self.done:
+                        for chunk in self.read_bytes(path, shards):
+                            output.write(chunk)
+        finally:
+            for shard in shards.values():
+                shard.close()
+
+    def close(self):
+        self.shard.close()
+        self.manifest.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,205 @@
+"""
+Single entry point for the ManoWhisper scripts.
+
+    manowhisper download transcripts --episodes URL --transcripts vtt
+    manowhisper classify hate csv --shows "/data/Tate Speech/vtt" tate-hate.csv
+    manowhisper visualize cloud "/data/Tim Pool/vtt" tim-pool.png
+
+Each subcommand runs one of the existing scripts with the remaining arguments.
+Nothing beyond click is imported until a subcommand runs, so `--help` and
+argument errors return immediately and models load only for the command that
+needs them.
+"""
+
+import os
+import runpy
+import subprocess
+import sys
+
+import click
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Subcommand groups: {command: (script path or module, help)}. Script paths
+# are relative to the repository root; dotted names are run as modules.
+COMMANDS = {
+    "download": {
+        "transcripts": (
+            "téléchargeur/agloop.py",
+            "Download transcripts from an episodes API as WebVTT.",
+        ),
+        "feed": (
+            "téléchargeur/pill-feeder.py",
+            "Save episode descriptions from an RSS feed.",
+        ),
+        "config": (
+            "téléchargeur/telechargeur",
+            "Download a podcast's episodes from a config file.",
+        ),
+        "pack": (
+            "manowhisper.corpus",
+            "Pack a show's transcripts into a columnar corpus store.",
+        ),
+    },
+    "watch": {
+        "media": (
+            "les-observateurs/les-observateurs.py",
+            "Watch a media directory and transcribe new episodes.",
+        ),
+        "transcribe": (
+            "les-observateurs/careless-whisper-pill.py",
+            "Transcribe every media file in a directory with Whisper.",
+        ),
+    },
+    "classify": {
+        "hate": (
+            "podcasting-patriarchy/hate.py",
+            "Classify hate speech in transcripts, or chart the results.",
+        ),
+        "misogyny": (
+            "podcasting-patriarchy/misogyny.py",
+            "Classify misogyny in transcripts, or chart the results.",
+        ),
+        "emotion": (
+            "podcasting-patriarchy/emotional-corpus.py",
+            "Average emotion scores per transcript into a Google Sheet.",
+        ),
+        "all": (
+            "manowhisper.analyze",
+            "Run several classifiers over transcripts in a single pass.",
+        ),
+        "zero-shot": (
+            "red-pill-bottles/zero-shot-thirty.py",
+            "Zero-shot classify transcripts against candidate labels.",
+        ),
+        "summary-emotion": (
+            "red-pill-bottles/EMOTIONAL-DAMAGE.py",
+            "Add emotion scores for summaries to a Google Sheet.",
+        ),
+        "entities": (
+            "red-pill-bottles/entity-matrix.py",
+            "Write named entity counts to a Google Sheet.",
+        ),
+        "triage": (
+            "manowhisper.triage",
+            "Train and calibrate the lexical pre-filter for a classifier.",
+        ),
+        "parity": (
+            "manowhisper.backends",
+            "Compare a backend's scores with eager fp32.",
+        ),
+        "serve": (
+            "manowhisper.server",
+            "Keep classification models warm in a local daemon.",
+        ),
+    },
+    "recap": {
+        "summarize": (
+            "red-pill-recap/redpill-recap.py",
+            "Summarize a directory of transcripts.",
+        ),
+        "stats": (
+            "red-pill-recap/redpill-recap-transcript-stats.py",
+            "Write token, word and sentence statistics to CSV.",
+        ),
+        "sheets": (
+            "red-pill-recap/recap-in-the-sheets.py",
+            "Collect descriptions and summaries into a Google Sheet.",
+        ),
+    },
+    "visualize": {
+        "emotion-heatmap": (
+            "red-pill-visions/emotional-roller-coaster.py",
+            "Emotion heatmap across one transcript.",
+        ),
+        "hate-wave": (
+            "red-pill-visions/dicks-hate-the-police.py",
+            "Hate speech scores across one transcript.",
+        ),
+        "misogyny-wave": (
+            "red-pill-visions/wave-of-misogyny.py",
+            "Misogyny scores across one transcript.",
+        ),
+        "hate-donut": (
+            "red-pill-visions/donut-hate.py",
+            "Share of hate speech in a podcast.",
+        ),
+        "misogyny-donut": (
+            "red-pill-visions/donut-hate-women.py",
+            "Share of misogyny in a podcast.",
+        ),
+        "caliper": (
+            "red-pill-visions/red-pill-caliper.py",
+            "Episode lengths of a podcast.",
+        ),
+        "cloud": (
+            "red-pill-visions/red-pill-cloud.py",
+            "Word cloud of a podcast's transcripts.",
+        ),
+        "summary-emotions": (
+            "red-pill-visions/red-pill-emotional-damage.py",
+            "Emotions of summaries stored in Google Sheets.",
+        ),
+        "keywords": (
+            "red-pill-visions/red-pill-resonator.py",
+            "Keyword trends across podcasts.",
+        ),
+    },
+}
+
+
+GROUP_HELP = {
+    "download": "Fetch episodes, descriptions and transcripts.",
+    "watch": "Transcribe podcast audio with Whisper.",
+    "classify": "Score transcripts and summaries with the classifiers.",
+    "recap": "Summarize transcripts and report their statistics.",
+    "visualize": "Chart transcripts, scores and summaries.",
+}
+
+
+def run_target(target, args):
+    """Run a script or module as if it were invoked directly with args."""
+    if "/" not in target:
+        sys.argv = [target, *args]
+        runpy.run_module(target, run_name="__main__", alter_sys=True)
+        return
+
+    path = os.path.join(REPO_ROOT, target)
+    if not path.endswith(".py"):
+        sys.exit(subprocess.call(["bash", path, *args]))
+
+    # Match `python script.py`: the script's directory is importable and
+    # argv[0] is the script itself.
+    sys.argv = [path, *args]
+    sys.path.insert(0, os.path.dirname(path))
+    runpy.run_path(path, run_name="__main__")
+
+
+def script_command(name, target, help_text):
+    @click.command(
+        name=name,
+        help=help_text,
+        add_help_option=False,
+        context_settings={"ignore_unknown_options": True},
+    )
+    @click.argument("args", nargs=-1, type=click.UNPROCESSED)
+    def command(args):
+        run_target(target, args)
+
+    return command
+
+
+@click.group()
+def cli():
+    """Transcribe, classify, summarize and chart podcast transcripts."""
+
+
+for group_name, commands in COMMANDS.items():
+    group = click.Group(group_name, help=GROUP_HELP[group_name])
+    for name, (target, help_text) in commands.items():
+        group.add_command(script_command(name, target, help_text))
+    cli.add_command(group)
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,281 @@
+"""
+Packed columnar store of a show's parsed transcripts.
+
+Listing and parsing thousands of WebVTT files is slow on network storage, so a
+show's vtt/ directory can be packed once into a store of two Arrow IPC files:
+
+    episodes.arrow  episode_id, filename, mtime_ns, size, caption_count, duration
+    captions.arrow  episode_id, start, end, text; one record batch per episode
+
+Both files are memory-mapped when read, and each episode's captions are read
+(and decompressed) on their own. Rebuilding only re-parses files whose mtime
+or size changed:
+
+    python -m manowhisper.corpus "/data/Tate Speech/vtt"
+
+writes "/data/Tate Speech/corpus". The classifiers, red-pill-caliper.py and
+red-pill-cloud.py accept the store path wherever they take a VTT directory.
+Requires pyarrow (pip install -e ".[corpus]").
+"""
+
+import os
+
+import click
+from alive_progress import alive_bar
+
+from manowhisper.vtt import Captions, read_vtt
+
+EPISODES = "episodes.arrow"
+CAPTIONS = "captions.arrow"
+COMPRESSION = ["zstd", "lz4", "uncompressed"]
+
+# Stores opened by this process, keyed by path.
+_stores = {}
+
+
+def default_store_path(vtt_directory):
+    """The store beside a show's vtt/ directory, e.g. "<show>/corpus"."""
+    return os.path.join(os.path.dirname(os.path.abspath(vtt_directory)), "corpus")
+
+
+def is_store(path):
+    return os.path.isfile(os.path.join(path, EPISODES))
+
+
+def schemas():
+    import pyarrow as pa
+
+    episodes = pa.schema(
+        [
+            ("episode_id", pa.int32()),
+            ("filename", pa.string()),
+            ("mtime_ns", pa.int64()),
+            ("size", pa.int64()),
+            ("caption_count", pa.int32()),
+            ("duration", pa.float64()),
+        ]
+    )
+    captions = pa.schema(
+        [
+            ("episode_id", pa.int32()),
+            ("start", pa.float64()),
+            ("end", pa.float64()),
+            ("text", pa.large_string()),
+        ]
+    )
+    return episodes, captions
+
+
+class CorpusStore:
+    """Read-only, memory-mapped view of a packed show."""
+
+    def __init__(self, path):
+        import pyarrow as pa
+
+        self.path = path
+        episodes = pa.ipc.open_file(
+            pa.memory_map(os.path.join(path, EPISODES))
+        ).read_all()
+        self.filenames = episodes.column("filename").to_pylist()
+        self.mtimes = episodes.column("mtime_ns").to_pylist()
+        self.sizes = episodes.column("size").to_pylist()
+        self.durations = episodes.column("duration").to_pylist()
+        self.index = {name: i for i, name in enumerate(self.filenames)}
+        self.captions = pa.ipc.open_file(pa.memory_map(os.path.join(path, CAPTIONS)))
+
+    def __len__(self):
+        return len(self.filenames)
+
+    def batch(self, episode_id):
+        return self.captions.get_batch(episode_id)
+
+    def read(self, filename):
+        """An episode's Captions, with start and end as float64 numpy arrays."""
+        batch = self.batch(self.index[filename])
+        return Captions(
+            batch.column("text").to_pylist(),
+            batch.column("start").to_numpy(),
+            batch.column("end").to_numpy(),
+        )
+
+
+def open_store(path):
+    """Open a store once per process; forked workers inherit the mappings."""
+    if path not in _stores:
+        _stores[path] = CorpusStore(path)
+    return _stores[path]
+
+
+def list_transcripts(input_path):
+    """
+    Transcript paths in a store, a directory of VTT files, or a single file.
+
+    Episodes in a store are named "<store>/<filename>" for read_transcript.
+    """
+    if is_store(input_path):
+        store = open_store(input_path)
+        return [os.path.join(input_path, name) for name in store.filenames]
+    if os.path.isdir(input_path):
+        return sorted(
+            os.path.join(input_path, f)
+            for f in os.listdir(input_path)
+            if f.endswith(".vtt")
+        )
+    if os.path.isfile(input_path) and input_path.endswith(".vtt"):
+        return [input_path]
+    if is_store(os.path.dirname(input_path)):
+        return [input_path]
+    raise ValueError("Input must be a corpus store, a directory or a .vtt file.")
+
+
+def read_transcript(path, skip_empty=False):
+    """Captions for a VTT file, or for an episode in a packed store."""
+    store_path, filename = os.path.split(path)
+    if store_path in _stores or is_store(store_path):
+        captions = open_store(store_path).read(filename)
+        if skip_empty and not all(captions.texts):
+            keep = [i for i, text in enumerate(captions.texts) if text]
+            captions = Captions(
+                [captions.texts[i] for i in keep],
+                captions.starts[keep],
+                captions.ends[keep],
+            )
+        return captions
+    return read_vtt(path, skip_empty)
+
+
+def transcript_version(path):
+    """(mtime_ns, size) of a transcript, from the store for packed episodes."""
+    store_path, filename = os.path.split(path)
+    if store_path in _stores or is_store(store_path):
+        store = open_store(store_path)
+        episode_id = store.index[filename]
+        return store.mtimes[episode_id], store.sizes[episode_id]
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def read_transcript_text(path):
+    """A transcript's caption text joined into a single string."""
+    return " ".join(read_transcript(path).texts)
+
+
+def build_store(vtt_directory, store_path=None, compression="zstd"):
+    """
+    Pack a directory of VTT files into a store, reusing unchanged episodes.
+
+    Returns counts of added, updated, unchanged and removed episodes.
+    """
+    import pyarrow as pa
+
+    store_path = store_path or default_store_path(vtt_directory)
+    previous = CorpusStore(store_path) if is_store(store_path) else None
+    episode_schema, caption_schema = schemas()
+    options = pa.ipc.IpcWriteOptions(
+        compression=None if compression == "uncompressed" else compression
+    )
+
+    entries = sorted(
+        (
+            entry
+            for entry in os.scandir(vtt_directory)
+            if entry.name.endswith(".vtt") and entry.is_file()
+        ),
+        key=lambda entry: entry.name,
+    )
+
+    counts = {"added": 0, "updated": 0, "unchanged": 0, "removed": 0}
+    episodes = {name: [] for name in episode_schema.names}
+    os.makedirs(store_path, exist_ok=True)
+    captions_tmp = os.path.join(store_path, CAPTIONS + ".tmp")
+    episodes_tmp = os.path.join(store_path, EPISODES + ".tmp")
+
+    sink = pa.OSFile(captions_tmp, "wb")
+    writer = pa.ipc.new_file(sink, caption_schema, options=options)
+    with sink, writer, alive_bar(len(entries), title="Packing transcripts") as bar:
+        for episode_id, entry in enumerate(entries):
+            stat = entry.stat()
+            old_id = previous.index.get(entry.name) if previous else None
+
+            if (
+                old_id is not None
+                and previous.mtimes[old_id] == stat.st_mtime_ns
+                and previous.sizes[old_id] == stat.st_size
+            ):
+                old = previous.batch(old_id)
+                starts = old.column("start")
+                ends = old.column("end")
+                texts = old.column("text")
+                duration = previous.durations[old_id]
+                counts["unchanged"] += 1
+            else:
+                captions = read_vtt(entry.path)
+                starts = pa.array(captions.starts, pa.float64())
+                ends = pa.array(captions.ends, pa.float64())
+                texts = pa.array(captions.texts, pa.large_string())
+                duration = captions.ends[-1] if captions.ends else 0.0
+                counts["updated" if old_id is not None else "added"] += 1
+
+            writer.write_batch(
+                pa.record_batch(
+                    [
+                        pa.array([episode_id] * len(texts), pa.int32()),
+                        starts,
+                        ends,
+                        texts,
+                    ],
+                    schema=caption_schema,
+                )
+            )
+            episodes["episode_id"].append(episode_id)
+            episodes["filename"].append(entry.name)
+            episodes["mtime_ns"].append(stat.st_mtime_ns)
+            episodes["size"].append(stat.st_size)
+            episodes["caption_count"].append(len(texts))
+            episodes["duration"].append(duration)
+            bar()
+
+    if previous:
+        counts["removed"] = len(set(previous.filenames) - {e.name for e in entries})
+
+    table = pa.Table.from_pydict(episodes, schema=episode_schema)
+    with pa.OSFile(episodes_tmp, "wb") as sink:
+        with pa.ipc.new_file(sink, episode_schema, options=options) as writer:
+            writer.write_table(table)
+
+    # The episode table is swapped in last, so readers never see an index
+    # pointing past the end of the caption file.
+    os.replace(captions_tmp, os.path.join(store_path, CAPTIONS))
+    os.replace(episodes_tmp, os.path.join(store_path, EPISODES))
+    _stores.pop(store_path, None)
+    return counts
+
+
+@click.command()
+@click.option(
+    "--output",
+    "-o",
+    "store_path",
+    type=click.Path(),
+    help="Store directory  [default: corpus/ beside VTT_DIRECTORY]",
+)
+@click.option(
+    "--compression",
+    type=click.Choice(COMPRESSION),
+    default="zstd",
+    show_default=True,
+    help="Arrow buffer compression; uncompressed stores are read zero-copy",
+)
+@click.argument("vtt_directory", type=click.Path(exists=True, file_okay=False))
+def main(store_path, compression, vtt_directory):
+    """Pack a directory of VTT files into a columnar corpus store."""
+    store_path = store_path or default_store_path(vtt_directory)
+    counts = build_store(vtt_directory, store_path, compression)
+    print(
+        f"Packed {store_path}: {counts['added']} added, {counts['updated']} "
+        f"updated, {counts['unchanged']} unchanged, {counts['removed']} removed"
+    )
+
+
+if __name__ == "__main__":
+    main()
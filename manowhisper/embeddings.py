@@ -0,0 +1,115 @@
+"""
+Embedding-similarity zero-shot labeling.
+
+Each transcript chunk is encoded once with a small sentence-embedding model
+and the vectors are kept in the score store beside the transcript's other
+per-episode arrays. Any label set is then scored with NumPy alone: label
+descriptions are encoded, each chunk's cosine similarities to them become a
+distribution, and distributions are averaged over the episode by chunk
+length. Re-labeling a corpus with a new taxonomy only encodes the labels.
+"""
+
+import re
+
+import numpy as np
+
+from manowhisper.inference import DEFAULT_BATCH_SIZE, length_sorted_batches
+from manowhisper.scorestore import ScoreStore
+from manowhisper.windows import token_windows
+
+DEFAULT_EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+# The MiniLM sentence models were trained on inputs of up to 256 tokens.
+DEFAULT_EMBEDDING_CHUNK_TOKENS = 256
+# Softmax temperature turning cosine similarities into label scores.
+SIMILARITY_TEMPERATURE = 0.05
+
+
+class SentenceEncoder:
+    """Mean-pooled, L2-normalized sentence embeddings from a transformers model."""
+
+    def __init__(self, model_name=DEFAULT_EMBEDDING_MODEL):
+        from transformers import AutoModel, AutoTokenizer
+
+        self.model_name = model_name
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        self.model = AutoModel.from_pretrained(model_name)
+        self.model.eval()
+
+    @property
+    def dimensions(self):
+        return self.model.config.hidden_size
+
+    def encode(self, texts, batch_size=DEFAULT_BATCH_SIZE):
+        """float32 array with one unit-length row per text."""
+        import torch
+
+        vectors = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        lengths = [len(text) for text in texts]
+        for batch in length_sorted_batches(lengths, batch_size):
+            encoded = self.tokenizer(
+                [texts[i] for i in batch],
+                truncation=True,
+                padding=True,
+                return_tensors="pt",
+            )
+            with torch.inference_mode():
+                hidden = self.model(**encoded).last_hidden_state
+            mask = encoded["attention_mask"].unsqueeze(-1).to(hidden.dtype)
+            pooled = (hidden * mask).sum(1) / mask.sum(1).clamp(min=1e-9)
+            pooled = torch.nn.functional.normalize(pooled, dim=-1)
+            vectors[batch] = pooled.float().numpy()
+        return vectors
+
+
+def embedding_store(encoder, chunk_tokens, stride, root=None):
+    """Score store holding an encoder's chunk vectors for one chunking."""
+    name = re.sub(r"[^A-Za-z0-9._-]+", "--", encoder.model_name)
+    return ScoreStore(
+        f"embeddings-{name}", "torch", f"chunks{chunk_tokens}-{stride}", root
+    )
+
+
+def store_columns(encoder):
+    """Stored columns: the chunk's token count, then its vector."""
+    return ["tokens"] + [f"dim{i}" for i in range(encoder.dimensions)]
+
+
+def chunk_embeddings(
+    transcript,
+    read_text,
+    encoder,
+    store,
+    chunk_tokens=DEFAULT_EMBEDDING_CHUNK_TOKENS,
+    stride=0,
+    batch_size=DEFAULT_BATCH_SIZE,
+    rescore=False,
+):
+    """
+    (token counts, unit vectors) for a transcript's chunks, encoding and
+    storing them only when the store has none for this version.
+    """
+    columns = store_columns(encoder)
+    stored = None if rescore else store.load(transcript, columns)
+    if stored is None:
+        chunks = token_windows(
+            read_text(transcript), encoder.tokenizer, chunk_tokens, stride
+        )
+        vectors = encoder.encode([text for text, _ in chunks], batch_size)
+        lengths = np.asarray([length for _, length in chunks], dtype=np.float32)
+        stored = store.save(transcript, columns, np.column_stack([lengths, vectors]))
+    return np.asarray(stored[:, 0], np.float32), np.asarray(stored[:, 1:], np.float32)
+
+
+def similarity_scores(vectors, lengths, label_vectors):
+    """
+    Label scores for an episode: a softmax over each chunk's cosine
+    similarities to the labels, averaged over chunks by length.
+    """
+    if not len(vectors):
+        return np.zeros(len(label_vectors))
+    # Stored vectors are float16, so renormalize before comparing.
+    vectors = vectors / np.linalg.norm(vectors, axis=1, keepdims=True).clip(1e-9)
+    logits = vectors @ label_vectors.T / SIMILARITY_TEMPERATURE
+    exp = np.exp(logits - logits.max(axis=1, keepdims=True))
+    probabilities = exp / exp.sum(axis=1, keepdims=True)
+    return lengths @ probabilities / lengths.sum()
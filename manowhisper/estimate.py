@@ -0,0 +1,150 @@
+"""
+Estimate the share of positive sentences in a show from a stratified sample.
+
+The pie charts only need the proportion of hate or misogynist sentences, so
+rather than classifying every sentence, sentences are drawn in an order where
+every prefix is a proportional stratified sample by episode: each episode
+contributes in proportion to its length. Sampling continues in rounds until
+the confidence interval is no wider than the target, or every sentence has
+been classified.
+
+The sample is self-weighting, so the estimate is the sample proportion. The
+interval is a Wilson score interval whose effective sample size accounts for
+the finite population and for the (usually smaller) within-episode variance.
+"""
+
+import math
+from collections import namedtuple
+from statistics import NormalDist
+
+import numpy as np
+
+DEFAULT_CI_WIDTH = 0.02
+DEFAULT_CONFIDENCE = 0.95
+MIN_SAMPLE = 400
+MIN_ROUND = 256
+# Below this many within-episode degrees of freedom, the pooled variance is
+# too noisy and the unstratified variance is used instead.
+MIN_POOLED_DF = 30
+
+Estimate = namedtuple(
+    "Estimate", ["proportion", "low", "high", "sampled", "population", "confidence"]
+)
+
+
+def sample_order(strata, rng):
+    """
+    Indices of all items, ordered so every prefix is a proportional
+    stratified sample. Items take a random rank within their stratum and a
+    random per-stratum offset, and are sorted by (rank + offset) / size.
+    """
+    sizes = np.bincount(strata)
+    starts = np.cumsum(sizes) - sizes
+    # Shuffle within strata: sort by stratum, then by a random key.
+    shuffled = np.lexsort((rng.random(len(strata)), strata))
+    ranks = np.empty(len(strata))
+    ranks[shuffled] = np.arange(len(strata)) - starts[strata[shuffled]]
+    offsets = rng.random(len(sizes))
+    keys = (ranks + offsets[strata]) / sizes[strata]
+    return np.argsort(keys, kind="stable")
+
+
+def wilson_interval(proportion, effective_n, confidence):
+    z = NormalDist().inv_cdf((1 + confidence) / 2)
+    denominator = 1 + z**2 / effective_n
+    center = (proportion + z**2 / (2 * effective_n)) / denominator
+    half = (
+        z
+        * math.sqrt(
+            proportion * (1 - proportion) / effective_n + z**2 / (4 * effective_n**2)
+        )
+        / denominator
+    )
+    return max(0.0, center - half), min(1.0, center + half)
+
+
+def stratified_estimate(positives, counts, population, confidence):
+    """Estimate and interval from per-stratum positive and sample counts."""
+    sampled = int(counts.sum())
+    proportion = positives.sum() / sampled
+    if sampled >= population:
+        return Estimate(
+            proportion, proportion, proportion, sampled, population, confidence
+        )
+
+    variance = proportion * (1 - proportion)
+    design_effect = 1.0
+    degrees = sampled - np.count_nonzero(counts)
+    if variance > 0 and degrees >= MIN_POOLED_DF:
+        sampled_strata = counts > 0
+        within = (
+            positives[sampled_strata]
+            - positives[sampled_strata] ** 2 / counts[sampled_strata]
+        ).sum() / degrees
+        design_effect = min(1.0, within / variance)
+
+    correction = 1 - sampled / population
+    effective_n = sampled / max(design_effect * correction, 1e-12)
+    low, high = wilson_interval(proportion, effective_n, confidence)
+    return Estimate(proportion, low, high, sampled, population, confidence)
+
+
+def estimate_proportion(
+    texts,
+    strata,
+    is_positive,
+    ci_width=DEFAULT_CI_WIDTH,
+    confidence=DEFAULT_CONFIDENCE,
+    seed=None,
+    min_sample=MIN_SAMPLE,
+):
+    """
+    Estimate the share of texts for which is_positive holds.
+
+    strata labels each text's episode (any hashable). is_positive takes a
+    list of texts and returns a bool for each, e.g. by running a classifier.
+    """
+    if not texts:
+        raise ValueError("There are no sentences to sample.")
+    codes = {}
+    strata = np.fromiter(
+        (codes.setdefault(stratum, len(codes)) for stratum in strata),
+        dtype=np.intp,
+        count=len(texts),
+    )
+    order = sample_order(strata, np.random.default_rng(seed))
+    positives = np.zeros(strata.max() + 1)
+    counts = np.zeros(strata.max() + 1)
+    population = len(texts)
+
+    sampled = 0
+    target = min(min_sample, population)
+    while True:
+        batch = order[sampled:target]
+        flags = np.asarray(is_positive([texts[i] for i in batch]), dtype=float)
+        np.add.at(positives, strata[batch], flags)
+        np.add.at(counts, strata[batch], 1)
+        sampled = target
+
+        estimate = stratified_estimate(positives, counts, population, confidence)
+        width = estimate.high - estimate.low
+        print(
+            f"Sampled {sampled:,} of {population:,}: {estimate.proportion:.1%} "
+            f"({estimate.low:.1%} to {estimate.high:.1%})"
+        )
+        if sampled >= population or width <= ci_width:
+            return estimate
+
+        # Width shrinks roughly with the square root of the sample size.
+        needed = int(sampled * (width / ci_width) ** 2 * 1.1)
+        target = min(population, max(needed, sampled + MIN_ROUND))
+
+
+def describe_estimate(estimate):
+    """A one-line summary of an estimate for chart footers."""
+    return (
+        f"Estimated {estimate.proportion:.1%} "
+        f"({estimate.confidence:.0%} CI {estimate.low:.1%} to {estimate.high:.1%}) "
+        f"from {estimate.sampled:,} of {estimate.population:,} sentences, "
+        "stratified by episode"
+    )
@@ -0,0 +1,111 @@
+"""
+Extractive pre-filter that shrinks a transcript before abstractive summarizing.
+
+Much of a podcast transcript is filler ("yeah", "right", ad reads). Sentences
+are scored by TF-IDF centrality: the cosine similarity of each sentence to
+the centroid of the whole episode, so sentences about what the episode is
+mostly about rank highest. The most central sentences are kept, in their
+original order, until a token budget is filled.
+
+Centroid similarity is linear in the transcript's length, unlike TextRank's
+sentence-by-sentence graph, so it stays cheap on multi-hour episodes.
+"""
+
+import math
+import re
+
+import numpy as np
+
+TOKEN = re.compile(r"[a-z0-9']+")
+# Sentences with fewer words are filler and are never kept.
+MIN_WORDS = 5
+# Words in more than this share of sentences ("you", "know", "the") carry
+# no topic. Too few sentences give no reliable share, so the cut only applies
+# from MIN_CUT_SENTENCES on.
+MAX_DOCUMENT_FREQUENCY = 0.1
+MIN_CUT_SENTENCES = 10
+
+
+def centrality(sentences):
+    """
+    TF-IDF cosine similarity of each sentence to the episode centroid.
+    Pass distinct sentences, so repeated ad reads and catchphrases do not
+    pull the centroid towards themselves.
+    """
+    vocabulary = {}
+    rows = []
+    columns = []
+    for i, sentence in enumerate(sentences):
+        for word in TOKEN.findall(sentence.lower()):
+            rows.append(i)
+            columns.append(vocabulary.setdefault(word, len(vocabulary)))
+    if not rows:
+        return np.zeros(len(sentences))
+
+    # Term counts per (sentence, word) pair.
+    pairs, counts = np.unique(
+        np.asarray(rows, np.int64) * len(vocabulary) + np.asarray(columns, np.int64),
+        return_counts=True,
+    )
+    rows, columns = np.divmod(pairs, len(vocabulary))
+    document_frequency = np.bincount(columns, minlength=len(vocabulary))
+    idf = np.log((1 + len(sentences)) / (1 + document_frequency)) + 1
+    if len(sentences) >= MIN_CUT_SENTENCES:
+        cutoff = max(2, math.ceil(MAX_DOCUMENT_FREQUENCY * len(sentences)))
+        idf[document_frequency > cutoff] = 0
+
+    weights = counts * idf[columns]
+    norms = np.sqrt(np.bincount(rows, weights**2, minlength=len(sentences)))
+    weights = weights / np.where(norms > 0, norms, 1)[rows]
+
+    centroid = np.bincount(columns, weights, minlength=len(vocabulary))
+    centroid /= max(math.sqrt(centroid @ centroid), 1e-12)
+    return np.bincount(rows, weights * centroid[columns], minlength=len(sentences))
+
+
+def select_sentences(sentences, lengths, budget):
+    """
+    Indices of the most central sentences whose lengths fit in budget, in
+    transcript order. Repeated sentences are kept at most once.
+    """
+    first = {}
+    for i, sentence in enumerate(sentences):
+        first.setdefault(sentence.lower(), i)
+    distinct = list(first.values())
+    scores = centrality([sentences[i] for i in distinct])
+
+    kept = []
+    used = 0
+    for j in np.argsort(-scores, kind="stable"):
+        i = distinct[j]
+        if len(sentences[i].split()) < MIN_WORDS or scores[j] <= 0:
+            continue
+        if used + lengths[i] <= budget:
+            kept.append(i)
+            used += lengths[i]
+    return sorted(kept)
+
+
+def leading_sentences(lengths, budget):
+    """Indices of the opening sentences that fit in budget, and at least one."""
+    kept = []
+    used = 0
+    for i, length in enumerate(lengths):
+        if kept and used + length > budget:
+            break
+        kept.append(i)
+        used += length
+    return kept
+
+
+def extract_salient(sentences, lengths, budget):
+    """
+    The most central sentences, up to budget tokens, joined in order. When
+    no sentence qualifies, the opening sentences are used instead.
+    """
+    if sum(lengths) <= budget:
+        return " ".join(sentences)
+    kept = select_sentences(sentences, lengths, budget) or leading_sentences(
+        lengths, budget
+    )
+    return " ".join(sentences[i] for i in kept)
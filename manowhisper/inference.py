@@ -0,0 +1,188 @@
+"""
+Batched inference helpers shared by the sentence-level classifiers.
+"""
+
+from manowhisper.cache import pipeline_identity, text_hash
+
+DEFAULT_BATCH_SIZE = 32
+
+
+def token_lengths(texts, model_pipeline):
+    """Count tokens for each text, falling back to characters."""
+    tokenizer = getattr(model_pipeline, "tokenizer", None)
+    if tokenizer is None:
+        return [len(text) for text in texts]
+    encoded = tokenizer(texts, add_special_tokens=False, truncation=False)
+    return [len(ids) for ids in encoded["input_ids"]]
+
+
+def accepts_encoded(model_pipeline):
+    """Whether texts can be tokenized ahead of time and fed to the model."""
+    return (
+        getattr(model_pipeline, "task", None) == "text-classification"
+        and getattr(model_pipeline, "tokenizer", None) is not None
+        and getattr(model_pipeline, "model", None) is not None
+    )
+
+
+def encode_texts(texts, model_pipeline):
+    """
+    Tokenize each distinct text once with the pipeline's tokenizer.
+
+    Returns {text: features} for classify_batched's encoded argument, or
+    None when the pipeline can only be called on raw text.
+    """
+    if not accepts_encoded(model_pipeline):
+        return None
+    unique = list(dict.fromkeys(texts))
+    encodings = model_pipeline.tokenizer(unique, truncation=True)
+    names = list(encodings.keys())
+    return {
+        text: {name: encodings[name][i] for name in names}
+        for i, text in enumerate(unique)
+    }
+
+
+def scores_to_outputs(model_pipeline, logits):
+    """Turn logits into the label dicts text-classification pipelines return."""
+    config = model_pipeline.model.config
+    if config.problem_type == "multi_label_classification" or config.num_labels == 1:
+        scores = logits.float().sigmoid()
+    else:
+        scores = logits.float().softmax(-1)
+
+    params = getattr(model_pipeline, "_postprocess_params", {}) or {}
+    top_k = params.get("top_k", "default")
+    outputs = []
+    for row in scores.cpu().numpy():
+        entries = sorted(
+            (
+                {"label": config.id2label[i], "score": score.item()}
+                for i, score in enumerate(row)
+            ),
+            key=lambda entry: entry["score"],
+            reverse=True,
+        )
+        if top_k == "default":
+            outputs.append(entries[0])
+        else:
+            outputs.append(entries if top_k is None else entries[:top_k])
+    return outputs
+
+
+def forward_encoded(model_pipeline, features):
+    """Pad pre-tokenized texts into one batch and run the model directly."""
+    import torch
+
+    batch = model_pipeline.tokenizer.pad(features, return_tensors="pt")
+    device = getattr(model_pipeline, "device", None)
+    if device is not None:
+        batch = {name: tensor.to(device) for name, tensor in batch.items()}
+    with torch.inference_mode():
+        logits = model_pipeline.model(**batch).logits
+    return scores_to_outputs(model_pipeline, logits)
+
+
+def length_sorted_batches(lengths, batch_size):
+    """Group indices into batches of similar length, longest first."""
+    order = sorted(range(len(lengths)), key=lambda i: lengths[i], reverse=True)
+    return [order[i : i + batch_size] for i in range(0, len(order), batch_size)]
+
+
+def run_batches(texts, model_pipeline, batch_size, bar=None, encoded=None, **kwargs):
+    """
+    Run the pipeline over texts in length-sorted batches, in input order.
+
+    With encoded features from encode_texts, the texts are not tokenized
+    again and padded batches go straight to the model.
+    """
+    results = [None] * len(texts)
+    if not texts:
+        return results
+
+    if encoded is not None and not kwargs:
+        lengths = [len(encoded[text]["input_ids"]) for text in texts]
+    else:
+        encoded = None
+        lengths = token_lengths(texts, model_pipeline)
+
+    for batch in length_sorted_batches(lengths, batch_size):
+        if encoded is not None:
+            outputs = forward_encoded(
+                model_pipeline, [encoded[texts[i]] for i in batch]
+            )
+        else:
+            outputs = model_pipeline(
+                [texts[i] for i in batch],
+                batch_size=len(batch),
+                truncation=True,
+                **kwargs,
+            )
+        for i, output in zip(batch, outputs):
+            # A single text yields a list of label dicts; keep that shape.
+            results[i] = output if isinstance(output, list) else [output]
+        if bar is not None:
+            bar(len(batch))
+
+    return results
+
+
+def classify_batched(
+    texts,
+    model_pipeline,
+    batch_size=DEFAULT_BATCH_SIZE,
+    bar=None,
+    cache=None,
+    triage=None,
+    encoded=None,
+    **kwargs,
+):
+    """
+    Run a text-classification pipeline over texts in length-sorted batches.
+
+    Results are returned in input order, each shaped like the output of
+    model_pipeline(text) for a single text. Pass an alive_bar handle as bar
+    to advance it as batches complete. With a ScoreCache, cached texts skip
+    the model entirely and repeated texts are only scored once. With a
+    TriageModel, texts it marks as clearly negative skip the model too.
+    Pass encode_texts output as encoded to reuse texts tokenized earlier.
+    """
+    texts = list(texts)
+    if triage is not None:
+        return triage.classify(
+            texts,
+            lambda uncertain: classify_batched(
+                uncertain,
+                model_pipeline,
+                batch_size,
+                bar,
+                cache,
+                encoded=encoded,
+                **kwargs,
+            ),
+            bar,
+        )
+
+    if cache is None:
+        return run_batches(texts, model_pipeline, batch_size, bar, encoded, **kwargs)
+
+    model_id, revision = pipeline_identity(model_pipeline)
+    hashes = [text_hash(text) for text in texts]
+    found = cache.get_many(model_id, revision, hashes)
+
+    pending = {}
+    for text, key in zip(texts, hashes):
+        if key not in found and key not in pending:
+            pending[key] = text
+    if bar is not None:
+        bar(len(texts) - len(pending))
+
+    scored = run_batches(
+        list(pending.values()), model_pipeline, batch_size, bar, encoded, **kwargs
+    )
+    new_items = list(zip(pending.keys(), scored))
+    if new_items:
+        cache.put_many(model_id, revision, new_items)
+    found.update(new_items)
+
+    return [found[key] for key in hashes]
@@ -0,0 +1,43 @@
+"""
+Registry of the sentence-level classifiers used across the scripts.
+"""
+
+from manowhisper.backends import build_pipeline
+from manowhisper.server import connect
+
+MODELS = {
+    "hate": "facebook/roberta-hate-speech-dynabench-r4-target",
+    "misogyny": "MilaNLProc/bert-base-uncased-ear-misogyny",
+    "emotion": "j-hartmann/emotion-english-distilroberta-base",
+}
+
+# Emotion scores are kept for every label; the others only need the top one.
+PIPELINE_KWARGS = {
+    "emotion": {"top_k": None},
+}
+
+EMOTION_LABELS = [
+    "anger",
+    "disgust",
+    "fear",
+    "joy",
+    "neutral",
+    "sadness",
+    "surprise",
+]
+
+
+def load_pipeline(name, backend="torch", use_server=True, **kwargs):
+    """
+    Build the text-classification pipeline for a registered model.
+
+    When the inference daemon is running, a client for its warm copy of the
+    model is returned instead of loading the weights in this process.
+    """
+    options = {**PIPELINE_KWARGS.get(name, {}), **kwargs}
+    if use_server:
+        remote = connect(name, backend, options)
+        if remote is not None:
+            print(f"Using {name} model from the inference server")
+            return remote
+    return build_pipeline("text-classification", MODELS[name], backend, **options)
@@ -0,0 +1,137 @@
+"""
+Score tables written by `hate.py csv` and `misogyny.py csv`.
+
+A run writes one row per classified sentence, either as CSV or as Parquet
+with dictionary-encoded filename, label and show columns and float32 scores.
+Sentences the triage pre-filter skipped have no score. Beside the table goes
+a small per-episode summary, "<output>.summary.csv":
+
+    show, filename, label, count, mean_score
+
+mean_score averages the scored sentences only.
+
+The graph commands chart label counts per show from the summary, and only
+read the show and label columns of the full table when the summary is missing
+or older than it. Parquet output requires pyarrow (pip install -e ".[parquet]").
+"""
+
+import csv
+import itertools
+import os
+
+SCORE_FORMATS = ["csv", "parquet"]
+COLUMNS = ["filename", "label", "score", "show"]
+SUMMARY_COLUMNS = ["show", "filename", "label", "count", "mean_score"]
+PARQUET_CHUNK_ROWS = 100_000
+PARQUET_MAGIC = b"PAR1"
+
+
+def summary_path(scores_path):
+    """The summary beside a score table, e.g. "tate-hate.csv.summary.csv"."""
+    return f"{scores_path}.summary.csv"
+
+
+def is_parquet(path):
+    with open(path, "rb") as f:
+        return f.read(len(PARQUET_MAGIC)) == PARQUET_MAGIC
+
+
+def summarize(rows, summary):
+    """Pass rows through, tallying (show, filename, label) counts and scores."""
+    for row in rows:
+        filename, label, score, show = row
+        tally = summary.setdefault((show, filename, label), [0, 0, 0.0])
+        tally[0] += 1
+        if score not in (None, ""):
+            tally[1] += 1
+            tally[2] += float(score)
+        yield row
+
+
+def write_parquet(rows, output_path, chunk_rows=PARQUET_CHUNK_ROWS):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    category = pa.dictionary(pa.int32(), pa.string())
+    schema = pa.schema(
+        [
+            ("filename", category),
+            ("label", category),
+            ("score", pa.float32()),
+            ("show", category),
+        ]
+    )
+    rows = iter(rows)
+    with pq.ParquetWriter(output_path, schema) as writer:
+        while True:
+            chunk = list(itertools.islice(rows, chunk_rows))
+            if not chunk:
+                break
+            filenames, labels, scores, shows = zip(*chunk)
+            writer.write_table(
+                pa.table(
+                    [
+                        pa.array(filenames, pa.string()).dictionary_encode(),
+                        pa.array(labels, pa.string()).dictionary_encode(),
+                        pa.array(
+                            [None if s in (None, "") else float(s) for s in scores],
+                            pa.float32(),
+                        ),
+                        pa.array(shows, pa.string()).dictionary_encode(),
+                    ],
+                    schema=schema,
+                )
+            )
+
+
+def write_summary(summary, path):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f, lineterminator="\n")
+        writer.writerow(SUMMARY_COLUMNS)
+        for (show, filename, label), (count, scored, score_sum) in summary.items():
+            mean_score = round(score_sum / scored, 6) if scored else ""
+            writer.writerow([show, filename, label, count, mean_score])
+
+
+def write_scores(checkpoint, paths, output_path, output_format="csv"):
+    """Write a run's checkpointed rows as CSV or Parquet, then its summary."""
+    summary = {}
+    rows = summarize(checkpoint.iter_rows(paths), summary)
+    if output_format == "csv":
+        checkpoint.assemble(paths, output_path, COLUMNS)
+        for _ in rows:
+            pass
+    elif output_format == "parquet":
+        write_parquet(rows, output_path)
+    else:
+        raise ValueError(
+            f"Unknown output format: {output_format}. Choose from {SCORE_FORMATS}."
+        )
+    write_summary(summary, summary_path(output_path))
+
+
+def show_label_counts(scores_path):
+    """
+    A table of label counts per show: a "show" column plus one per label.
+
+    Read from the summary when it is up to date, otherwise from the show and
+    label columns of the score table.
+    """
+    import pandas as pd
+
+    summary = summary_path(scores_path)
+    if os.path.exists(summary) and os.path.getmtime(summary) >= os.path.getmtime(
+        scores_path
+    ):
+        df = pd.read_csv(summary, usecols=["show", "label", "count"])
+        counts = df.groupby(["show", "label"])["count"].sum()
+    else:
+        if is_parquet(scores_path):
+            df = pd.read_parquet(scores_path, columns=["show", "label"])
+        else:
+            df = pd.read_csv(scores_path, usecols=["show", "label"], dtype="category")
+        counts = df.groupby(["show", "label"], observed=True).size()
+
+    table = counts.unstack(fill_value=0).reset_index()
+    table.columns.name = None
+    return table
@@ -0,0 +1,85 @@
+"""
+Per-episode score arrays kept for the chart scripts.
+
+Each classified transcript gets a float16 array with one row per classified
+caption or sentence, in transcript order, and one column per label:
+
+    <root>/<model>/<backend>-<segment>/<show>/<filename>.npy
+    <root>/<model>/<backend>-<segment>/<show>/<filename>.json
+
+The JSON sidecar records the transcript's version (mtime and size) and the
+column labels. Arrays are memory-mapped on load, so re-styling a chart never
+runs the model again unless the transcript changed. The root defaults to
+~/.cache/manowhisper/score-store, or $MANOWHISPER_SCORE_STORE.
+"""
+
+import json
+import os
+
+import numpy as np
+
+from manowhisper.corpus import transcript_version
+
+DEFAULT_SCORE_STORE = os.environ.get(
+    "MANOWHISPER_SCORE_STORE",
+    os.path.join(os.path.expanduser("~"), ".cache", "manowhisper", "score-store"),
+)
+
+
+def show_name(transcript):
+    """The show directory above a transcript's vtt/ or corpus/ directory."""
+    return os.path.basename(
+        os.path.dirname(os.path.dirname(os.path.abspath(transcript)))
+    )
+
+
+def score_matrix(results, labels):
+    """float16 array of each result's score per label; missing labels score 0."""
+    columns = {label: i for i, label in enumerate(labels)}
+    scores = np.zeros((len(results), len(labels)), dtype=np.float16)
+    for row, result in enumerate(results):
+        for entry in result:
+            if isinstance(entry, dict) and entry.get("label") in columns:
+                scores[row, columns[entry["label"]]] = entry["score"]
+    return scores
+
+
+class ScoreStore:
+    def __init__(self, model, backend="torch", segment="caption", root=None):
+        self.directory = os.path.join(
+            root or DEFAULT_SCORE_STORE, model, f"{backend}-{segment}"
+        )
+
+    def paths(self, transcript):
+        base = os.path.join(
+            self.directory, show_name(transcript), os.path.basename(transcript)
+        )
+        return f"{base}.npy", f"{base}.json"
+
+    def load(self, transcript, labels):
+        """The stored, memory-mapped scores, or None if missing or stale."""
+        array_path, meta_path = self.paths(transcript)
+        try:
+            with open(meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+            version = list(transcript_version(transcript))
+            if meta["version"] != version or meta["labels"] != list(labels):
+                return None
+            return np.load(array_path, mmap_mode="r")
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def save(self, transcript, labels, scores):
+        """Store an episode's scores; the sidecar is written last."""
+        array_path, meta_path = self.paths(transcript)
+        os.makedirs(os.path.dirname(array_path), exist_ok=True)
+
+        with open(f"{array_path}.tmp", "wb") as f:
+            np.save(f, np.asarray(scores, dtype=np.float16))
+        os.replace(f"{array_path}.tmp", array_path)
+
+        meta = {"version": list(transcript_version(transcript)), "labels": list(labels)}
+        with open(f"{meta_path}.tmp", "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(f"{meta_path}.tmp", meta_path)
+        return np.load(array_path, mmap_mode="r")
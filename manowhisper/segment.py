@@ -0,0 +1,118 @@
+"""
+Re-segment caption fragments into sentences for classification.
+
+Whisper and fudgie captions are arbitrary slices of speech, often half a
+sentence. Scoring each one costs a forward pass on a short, context-free
+input. Merging them into sentences, capped at a word budget so unpunctuated
+speech still becomes bounded windows, gives the model fewer and denser inputs.
+
+Each segment keeps its start and end time, so scores still plot on the
+episode's time axis, and the range of source captions it came from. A
+caption holding the end of one sentence and the start of the next is split,
+with times interpolated by character position.
+"""
+
+import re
+from array import array
+from collections import namedtuple
+
+from manowhisper.corpus import read_transcript
+from manowhisper.vtt import Captions
+
+SEGMENT_MODES = ["caption", "sentence"]
+DEFAULT_MAX_WORDS = 60
+
+Segments = namedtuple(
+    "Segments", ["texts", "starts", "ends", "first_caption", "last_caption"]
+)
+
+SENTENCE_BREAK = re.compile(r"(?<=[.!?])\s+|(?<=[.!?][\"')\]])\s+")
+SENTENCE_END = re.compile(r"[.!?][\"')\]]?$")
+
+
+def caption_pieces(text, start, end, max_words):
+    """
+    Split one caption at sentence breaks, and any run longer than max_words
+    into word windows. Yields (piece, start, end) with interpolated times.
+    """
+    # Character offset just past each word, for interpolating times.
+    ends = []
+    offset = 0
+    for word in text.split():
+        offset = text.index(word, offset) + len(word)
+        ends.append(offset)
+    duration = (end - start) / len(text)
+
+    position = 0
+    for sentence in SENTENCE_BREAK.split(text):
+        words = sentence.split()
+        for i in range(0, len(words), max_words):
+            chunk = words[i : i + max_words]
+            piece_start = ends[position] - len(chunk[0])
+            position += len(chunk)
+            yield (
+                " ".join(chunk),
+                start + piece_start * duration,
+                start + ends[position - 1] * duration,
+            )
+
+
+def segment_captions(captions, max_words=DEFAULT_MAX_WORDS):
+    """
+    Merge Captions into sentences of at most max_words words.
+
+    Returns Segments with each segment's text, start and end in seconds, and
+    the indices of the first and last caption it draws from.
+    """
+    segments = Segments([], array("d"), array("d"), array("l"), array("l"))
+    parts = []
+    word_count = 0
+    seg_start = seg_end = 0.0
+    first = last = 0
+
+    def flush():
+        segments.texts.append(" ".join(parts))
+        segments.starts.append(seg_start)
+        segments.ends.append(seg_end)
+        segments.first_caption.append(first)
+        segments.last_caption.append(last)
+        parts.clear()
+
+    for index, (text, start, end) in enumerate(
+        zip(captions.texts, captions.starts, captions.ends)
+    ):
+        if not text:
+            continue
+        for piece, piece_start, piece_end in caption_pieces(
+            text, start, end, max_words
+        ):
+            words = len(piece.split())
+            if parts and word_count + words > max_words:
+                flush()
+            if not parts:
+                seg_start = piece_start
+                first = index
+                word_count = 0
+            parts.append(piece)
+            word_count += words
+            seg_end = piece_end
+            last = index
+            if SENTENCE_END.search(piece):
+                flush()
+
+    if parts:
+        flush()
+    return segments
+
+
+def read_segments(path, segment="caption", max_words=DEFAULT_MAX_WORDS):
+    """
+    Classifier inputs for a transcript: non-empty captions as they are, or
+    merged into sentences. Returns (texts, starts, ends).
+    """
+    captions = read_transcript(path, skip_empty=True)
+    if segment == "caption":
+        return captions
+    if segment == "sentence":
+        return Captions(*segment_captions(captions, max_words)[:3])
+    raise ValueError(f"Unknown segment mode: {segment}. Choose from {SEGMENT_MODES}.")
@@ -0,0 +1,269 @@
+"""
+Long-lived local inference daemon.
+
+Keeps classification pipelines loaded and answers requests from the scripts
+over a Unix socket, so each chart no longer pays for importing transformers
+and loading weights. Requests for the same model that arrive close together,
+from any number of clients, are merged into shared batches.
+
+Usage:
+    python -m manowhisper.server --models hate,misogyny,emotion
+
+Scripts find the daemon through load_pipeline() and fall back to loading the
+model in-process when the socket is absent.
+"""
+
+import json
+import os
+import queue
+import socket
+import socketserver
+import struct
+import threading
+
+import click
+
+DEFAULT_SOCKET_PATH = os.environ.get(
+    "MANOWHISPER_SOCKET",
+    os.path.join(os.path.expanduser("~"), ".cache", "manowhisper", "server.sock"),
+)
+
+# How long to wait for other clients' requests before running a batch.
+BATCH_WINDOW = 0.01
+MAX_BATCH_TEXTS = 1024
+# Seconds to wait for the daemon to accept a connection.
+CONNECT_TIMEOUT = 5
+
+HEADER = struct.Struct("!I")
+
+
+def send_message(sock, message):
+    payload = json.dumps(message).encode("utf-8")
+    sock.sendall(HEADER.pack(len(payload)) + payload)
+
+
+def recv_exactly(sock, size):
+    chunks = []
+    while size:
+        chunk = sock.recv(min(size, 1 << 20))
+        if not chunk:
+            raise ConnectionError("Connection closed mid-message.")
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+
+def recv_message(sock):
+    (size,) = HEADER.unpack(recv_exactly(sock, HEADER.size))
+    return json.loads(recv_exactly(sock, size).decode("utf-8"))
+
+
+def request(message, socket_path=DEFAULT_SOCKET_PATH):
+    """Send one request to the daemon and return its reply."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(CONNECT_TIMEOUT)
+        sock.connect(socket_path)
+        # Replies wait on model loading and batching, so only connecting times out.
+        sock.settimeout(None)
+        send_message(sock, message)
+        reply = recv_message(sock)
+    if "error" in reply:
+        raise RuntimeError(f"Inference server error: {reply['error']}")
+    return reply
+
+
+class RemotePipeline:
+    """
+    Client stand-in for a text-classification pipeline served by the daemon.
+
+    Supports the calls classify_batched makes. Each call opens its own
+    connection, so instances are safe to use from forked workers.
+    """
+
+    tokenizer = None
+    task = "text-classification"
+
+    def __init__(self, name, backend, options, identity, socket_path):
+        self.name = name
+        self.backend = backend
+        self.options = options
+        self.identity = tuple(identity)
+        self.socket_path = socket_path
+
+    def __call__(self, texts, **kwargs):
+        single = isinstance(texts, str)
+        reply = request(
+            {
+                "op": "classify",
+                "model": self.name,
+                "backend": self.backend,
+                "options": self.options,
+                "texts": [texts] if single else list(texts),
+            },
+            self.socket_path,
+        )
+        return reply["results"][0] if single else reply["results"]
+
+
+def connect(name, backend="torch", options=None, socket_path=DEFAULT_SOCKET_PATH):
+    """Return a RemotePipeline if the daemon is running, otherwise None."""
+    options = options or {}
+    if not os.path.exists(socket_path):
+        return None
+    try:
+        reply = request(
+            {"op": "identity", "model": name, "backend": backend, "options": options},
+            socket_path,
+        )
+    except (OSError, RuntimeError, socket.timeout) as e:
+        print(f"Inference server unavailable ({e}), loading {name} in-process.")
+        return None
+    return RemotePipeline(name, backend, options, reply["identity"], socket_path)
+
+
+class Batcher:
+    """Runs one pipeline, merging queued requests into shared batches."""
+
+    def __init__(self, model_pipeline, batch_size):
+        self.model_pipeline = model_pipeline
+        self.batch_size = batch_size
+        self.pending = queue.Queue()
+        threading.Thread(target=self.loop, daemon=True).start()
+
+    def submit(self, texts):
+        job = {"texts": texts, "done": threading.Event()}
+        self.pending.put(job)
+        job["done"].wait()
+        if "error" in job:
+            raise job["error"]
+        return job["results"]
+
+    def collect(self):
+        jobs = [self.pending.get()]
+        total = len(jobs[0]["texts"])
+        while total < MAX_BATCH_TEXTS:
+            try:
+                job = self.pending.get(timeout=BATCH_WINDOW)
+            except queue.Empty:
+                break
+            jobs.append(job)
+            total += len(job["texts"])
+        return jobs
+
+    def loop(self):
+        from manowhisper.inference import run_batches
+
+        while True:
+            jobs = self.collect()
+            texts = [text for job in jobs for text in job["texts"]]
+            try:
+                results = run_batches(texts, self.model_pipeline, self.batch_size)
+            except Exception as e:
+                for job in jobs:
+                    job["error"] = e
+                    job["done"].set()
+                continue
+
+            offset = 0
+            for job in jobs:
+                job["results"] = results[offset : offset + len(job["texts"])]
+                offset += len(job["texts"])
+                job["done"].set()
+
+
+class InferenceServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path, batch_size):
+        self.batch_size = batch_size
+        self.batchers = {}
+        self.lock = threading.Lock()
+        super().__init__(socket_path, RequestHandler)
+
+    def batcher(self, name, backend, options):
+        """Return the batcher for a pipeline, loading the model on first use."""
+        from manowhisper.models import load_pipeline
+
+        key = (name, backend, json.dumps(options, sort_keys=True))
+        with self.lock:
+            if key not in self.batchers:
+                print(f"Loading {name} ({backend}) {options or ''}")
+                model_pipeline = load_pipeline(
+                    name, backend, use_server=False, **options
+                )
+                self.batchers[key] = Batcher(model_pipeline, self.batch_size)
+            return self.batchers[key]
+
+
+class RequestHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        from manowhisper.cache import pipeline_identity
+
+        try:
+            message = recv_message(self.request)
+            batcher = self.server.batcher(
+                message["model"], message["backend"], message.get("options", {})
+            )
+            if message["op"] == "identity":
+                reply = {"identity": pipeline_identity(batcher.model_pipeline)}
+            elif message["op"] == "classify":
+                reply = {"results": batcher.submit(message["texts"])}
+            else:
+                reply = {"error": f"Unknown op: {message['op']}"}
+        except Exception as e:
+            reply = {"error": str(e)}
+        send_message(self.request, reply)
+
+
+@click.command()
+@click.option(
+    "--models",
+    "-m",
+    default="hate,misogyny,emotion",
+    show_default=True,
+    help="Comma-separated list of models to load at startup",
+)
+@click.option(
+    "--backend",
+    default="torch",
+    show_default=True,
+    help="CPU inference backend for preloaded models",
+)
+@click.option(
+    "--batch-size",
+    default=32,
+    show_default=True,
+    help="Sentences per model forward pass",
+)
+@click.option(
+    "--socket",
+    "socket_path",
+    default=DEFAULT_SOCKET_PATH,
+    show_default=True,
+    help="Unix socket to listen on",
+)
+def main(models, backend, batch_size, socket_path):
+    """Serve warm classification pipelines over a Unix socket."""
+    from manowhisper.models import PIPELINE_KWARGS
+
+    os.makedirs(os.path.dirname(socket_path) or ".", exist_ok=True)
+    if os.path.exists(socket_path):
+        os.remove(socket_path)
+
+    server = InferenceServer(socket_path, batch_size)
+    for name in filter(None, (name.strip() for name in models.split(","))):
+        # Preload with the same options load_pipeline sends by default.
+        server.batcher(name, backend, PIPELINE_KWARGS.get(name, {}))
+
+    print(f"Listening on {socket_path}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        os.remove(socket_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""
+Overlap transcript reading, tokenization and inference in one process.
+
+Classifying a corpus one file at a time leaves the inference cores idle
+while the next transcript is read and tokenized. classify_staged splits the
+work into three stages joined by bounded queues:
+
+    readers    threads parsing upcoming transcripts, up to --queue-depth ahead
+    tokenizer  a thread batch-encoding each transcript with the fast tokenizer
+    model      the calling thread, running padded batches through the model
+
+Results still come back in file order and go through classify_batched, so
+the score cache and triage work as before. Each stage's busy and stalled time
+and the average queue depths are reported at the end to show which stage
+bounds throughput.
+"""
+
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from manowhisper.inference import DEFAULT_BATCH_SIZE, classify_batched, encode_texts
+
+DEFAULT_READERS = 2
+DEFAULT_QUEUE_DEPTH = 8
+PUT_TIMEOUT = 0.1
+
+_DONE = object()
+
+
+class StageStats:
+    """Busy and stalled seconds for one stage, and the depth of its input."""
+
+    def __init__(self, name):
+        self.name = name
+        self.items = 0
+        self.busy = 0.0
+        self.starved = 0.0
+        self.blocked = 0.0
+        self.depth_total = 0
+        self.depth_samples = 0
+        self.max_depth = 0
+
+    def sample_depth(self, depth):
+        self.depth_total += depth
+        self.depth_samples += 1
+        self.max_depth = max(self.max_depth, depth)
+
+    def __str__(self):
+        line = (
+            f"{self.name}: {self.items:,} files, {self.busy:.1f}s busy, "
+            f"{self.starved:.1f}s waiting for input, {self.blocked:.1f}s blocked "
+            "on output"
+        )
+        if self.depth_samples:
+            depth = self.depth_total / self.depth_samples
+            line += f", input queue {depth:.1f} avg / {self.max_depth} max"
+        return line
+
+
+class StagedRun:
+    """Stats for one classify_staged run."""
+
+    def __init__(self):
+        self.stages = {name: StageStats(name) for name in ("read", "tokenize", "model")}
+
+    def report(self):
+        return "\n".join(f"  {stats}" for stats in self.stages.values())
+
+
+def _timed_read(read, path):
+    start = time.perf_counter()
+    texts = read(path)
+    return texts, time.perf_counter() - start
+
+
+def _produce(paths, read, model_pipeline, readers, depth, output, stop, run):
+    """Read and tokenize paths in order, feeding (texts, encoded) to output."""
+    read_stats = run.stages["read"]
+    tokenize_stats = run.stages["tokenize"]
+
+    def put(item):
+        start = time.perf_counter()
+        while not stop.is_set():
+            try:
+                output.put(item, timeout=PUT_TIMEOUT)
+                break
+            except queue.Full:
+                continue
+        tokenize_stats.blocked += time.perf_counter() - start
+
+    try:
+        with ThreadPoolExecutor(readers, thread_name_prefix="reader") as pool:
+            pending = iter(paths)
+            window = deque()
+            for path in pending:
+                window.append(pool.submit(_timed_read, read, path))
+                if len(window) >= depth:
+                    break
+
+            while window and not stop.is_set():
+                tokenize_stats.sample_depth(sum(future.done() for future in window))
+                start = time.perf_counter()
+                texts, seconds = window.popleft().result()
+                tokenize_stats.starved += time.perf_counter() - start
+                read_stats.busy += seconds
+                read_stats.items += 1
+
+                path = next(pending, None)
+                if path is not None:
+                    window.append(pool.submit(_timed_read, read, path))
+
+                start = time.perf_counter()
+                encoded = encode_texts(texts, model_pipeline)
+                tokenize_stats.busy += time.perf_counter() - start
+                tokenize_stats.items += 1
+                put((texts, encoded))
+
+            for future in window:
+                future.cancel()
+        put(_DONE)
+    except BaseException as exc:
+        put(exc)
+
+
+def classify_staged(
+    paths,
+    read,
+    model_pipeline,
+    batch_size=DEFAULT_BATCH_SIZE,
+    cache=None,
+    triage=None,
+    readers=DEFAULT_READERS,
+    depth=DEFAULT_QUEUE_DEPTH,
+    run=None,
+):
+    """
+    Yield classify_batched results for the texts read(path) returns, for each
+    path in order, with reading and tokenization running ahead in threads.
+
+    Pass a StagedRun as run to collect stage stats.
+    """
+    run = run or StagedRun()
+    model_stats = run.stages["model"]
+    tokenized = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+    producer = threading.Thread(
+        target=_produce,
+        args=(paths, read, model_pipeline, readers, depth, tokenized, stop, run),
+        name="tokenizer",
+        daemon=True,
+    )
+    producer.start()
+
+    try:
+        while True:
+            model_stats.sample_depth(tokenized.qsize())
+            start = time.perf_counter()
+            item = tokenized.get()
+            model_stats.starved += time.perf_counter() - start
+            if item is _DONE:
+                break
+            if isinstance(item, BaseException):
+                raise item
+
+            texts, encoded = item
+            start = time.perf_counter()
+            results = classify_batched(
+                texts,
+                model_pipeline,
+                batch_size,
+                cache=cache,
+                triage=triage,
+                encoded=encoded,
+            )
+            model_stats.busy += time.perf_counter() - start
+            model_stats.items += 1
+            yield results
+    finally:
+        stop.set()
+        producer.join()
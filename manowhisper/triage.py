@@ -0,0 +1,366 @@
+"""
+Lexical pre-filter that keeps clearly benign sentences away from the models.
+
+Most captions ("thanks for having me", ad reads) are obviously not hate
+speech or misogyny. A logistic regression over hashed word unigrams and
+bigrams scores each sentence in microseconds; sentences below a calibrated
+threshold get the model's negative label without a forward pass, and only
+the rest go to the transformer.
+
+Train and calibrate it on a sample scored by the full model (cached scores
+make this cheap), or on a labeled CSV with text and label columns:
+
+    python -m manowhisper.triage --model hate --sample 20000 "/data/Tate Speech/vtt"
+
+The sample is split into training and held-out sentences. The threshold is
+set from the held-out sentences so that the expected recall loss, the share
+of positive sentences skipped, stays within --max-recall-loss. The model is
+saved under ~/.cache/manowhisper/triage (or $MANOWHISPER_TRIAGE) and used by
+`hate.py csv --triage` and `misogyny.py csv --triage`.
+"""
+
+import csv
+import math
+import os
+import random
+import re
+import zlib
+
+import click
+import numpy as np
+from alive_progress import alive_bar
+
+from manowhisper.backends import BACKENDS
+from manowhisper.cache import open_cache
+from manowhisper.corpus import list_transcripts, read_transcript
+from manowhisper.inference import DEFAULT_BATCH_SIZE, classify_batched
+
+TRIAGE_DIR = os.environ.get(
+    "MANOWHISPER_TRIAGE",
+    os.path.join(os.path.expanduser("~"), ".cache", "manowhisper", "triage"),
+)
+LABELS = {
+    "hate": ("hate", "nothate"),
+    "misogyny": ("misogynist", "non-misogynist"),
+}
+HASH_BITS = 18
+DEFAULT_SAMPLE = 20000
+DEFAULT_MAX_RECALL_LOSS = 0.01
+REPORTED_LOSSES = [0.0, 0.005, 0.01, 0.02, 0.05]
+HOLDOUT_FRACTION = 0.25
+TOKEN = re.compile(r"[a-z0-9']+")
+
+# Triage models loaded by this process, keyed by classifier name.
+_models = {}
+
+
+def features(text, bits=HASH_BITS):
+    """Hashed indices of a sentence's lowercased unigrams and bigrams."""
+    tokens = TOKEN.findall(text.lower())
+    grams = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+    mask = (1 << bits) - 1
+    return np.unique(
+        np.fromiter(
+            (zlib.crc32(gram.encode("utf-8")) & mask for gram in grams),
+            dtype=np.int64,
+            count=len(grams),
+        )
+    )
+
+
+def sigmoid(z):
+    return 1 / (1 + math.exp(-z)) if z >= 0 else math.exp(z) / (1 + math.exp(z))
+
+
+def train(texts, positives, bits=HASH_BITS, epochs=5, learning_rate=0.1, l2=1e-6):
+    """
+    Fit a class-balanced logistic regression with SGD.
+
+    Returns (weights, bias). Positives are weighted up so rare positive
+    sentences are not traded away for accuracy on the benign majority.
+    """
+    rows = [features(text, bits) for text in texts]
+    y = np.asarray(positives, dtype=float)
+    positive_share = min(max(y.mean(), 1 / len(y)), 1 - 1 / len(y))
+    sample_weights = np.where(y == 1, 0.5 / positive_share, 0.5 / (1 - positive_share))
+
+    weights = np.zeros(1 << bits)
+    bias = 0.0
+    rng = np.random.default_rng(0)
+    for epoch in range(epochs):
+        rate = learning_rate / (1 + epoch)
+        for i in rng.permutation(len(rows)):
+            idx = rows[i]
+            p = sigmoid(weights[idx].sum() + bias)
+            gradient = (p - y[i]) * sample_weights[i]
+            weights[idx] -= rate * (gradient + l2 * weights[idx])
+            bias -= rate * gradient
+    return weights.astype(np.float32), bias
+
+
+def recall_loss_threshold(probabilities, positives, max_recall_loss):
+    """
+    The threshold whose expected recall loss on new sentences is at most
+    max_recall_loss. Sentences scoring strictly below it are skipped.
+
+    It is the held-out positive score of rank floor(loss * (P + 1)), so a
+    new positive falls below it with probability at most the loss. With too
+    few held-out positives for the budget, it is 0 and nothing is skipped.
+    """
+    positive_scores = np.sort(np.asarray(probabilities)[np.asarray(positives, bool)])
+    rank = int(max_recall_loss * (len(positive_scores) + 1))
+    if rank < 1:
+        return 0.0
+    return float(positive_scores[rank - 1])
+
+
+class TriageModel:
+    def __init__(self, model, weights, bias, threshold, bits=HASH_BITS):
+        self.model = model
+        self.weights = weights
+        self.bias = bias
+        self.threshold = threshold
+        self.bits = bits
+        self.negative_label = LABELS[model][1]
+        self.skipped = 0
+        self.total = 0
+
+    def probabilities(self, texts):
+        """Probability that each sentence is positive."""
+        return [
+            sigmoid(self.weights[features(text, self.bits)].sum() + self.bias)
+            for text in texts
+        ]
+
+    def classify(self, texts, classify_uncertain, bar=None):
+        """
+        Results for texts, shaped like pipeline output. Sentences below the
+        threshold get the negative label with no score, since the pre-filter's
+        probability is not on the model's scale; the rest are passed to
+        classify_uncertain as one list.
+        """
+        probabilities = self.probabilities(texts)
+        uncertain = [i for i, p in enumerate(probabilities) if p >= self.threshold]
+        results = [[{"label": self.negative_label, "score": None}] for _ in texts]
+        for i, result in zip(
+            uncertain, classify_uncertain([texts[i] for i in uncertain])
+        ):
+            results[i] = result
+
+        self.skipped += len(texts) - len(uncertain)
+        self.total += len(texts)
+        if bar is not None:
+            bar(len(texts) - len(uncertain))
+        return results
+
+    def stats(self):
+        rate = self.skipped / self.total if self.total else 0
+        return (
+            f"Triage: {self.skipped:,} of {self.total:,} sentences skipped the "
+            f"model ({rate:.1%})"
+        )
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(f"{path}.tmp", "wb") as f:
+            np.savez(
+                f,
+                weights=self.weights,
+                bias=self.bias,
+                threshold=self.threshold,
+                bits=self.bits,
+            )
+        os.replace(f"{path}.tmp", path)
+
+
+def triage_path(model):
+    return os.path.join(TRIAGE_DIR, f"{model}.npz")
+
+
+def load_triage(model):
+    """Load a calibrated triage model once per process."""
+    if model not in _models:
+        path = triage_path(model)
+        if not os.path.exists(path):
+            raise FileNotFoundError(
+                f"No triage model for {model} at {path}. Calibrate one with "
+                f"python -m manowhisper.triage --model {model} TRANSCRIPTS"
+            )
+        with np.load(path) as data:
+            _models[model] = TriageModel(
+                model,
+                data["weights"],
+                float(data["bias"]),
+                float(data["threshold"]),
+                int(data["bits"]),
+            )
+    return _models[model]
+
+
+def sample_captions(paths, size, rng):
+    """A uniform random sample of non-empty captions, by reservoir sampling."""
+    sample = []
+    seen = 0
+    transcripts = [t for path in paths for t in list_transcripts(path)]
+    with alive_bar(len(transcripts), title="Sampling captions") as bar:
+        for transcript in transcripts:
+            for text in read_transcript(transcript, skip_empty=True).texts:
+                seen += 1
+                if len(sample) < size:
+                    sample.append(text)
+                else:
+                    j = rng.randrange(seen)
+                    if j < size:
+                        sample[j] = text
+            bar()
+    return sample
+
+
+def read_labeled(path, positive_label):
+    """Texts and positive flags from a CSV with text and label columns."""
+    texts = []
+    positives = []
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            texts.append(row["text"])
+            positives.append(
+                row["label"].strip().lower() in (positive_label, "1", "true", "yes")
+            )
+    return texts, positives
+
+
+def score_with_model(texts, model, backend, batch_size, use_cache):
+    """Label texts with the full pipeline, reusing cached scores."""
+    from manowhisper.models import load_pipeline
+
+    positive_label = LABELS[model][0]
+    model_pipeline = load_pipeline(model, backend)
+    cache = open_cache(use_cache)
+    with alive_bar(len(texts), title="Scoring sample") as bar:
+        results = classify_batched(
+            texts, model_pipeline, batch_size, bar=bar, cache=cache
+        )
+    if cache:
+        print(cache.stats())
+        cache.close()
+    return [
+        max(result, key=lambda entry: entry["score"])["label"] == positive_label
+        for result in results
+    ]
+
+
+@click.command()
+@click.option(
+    "--model",
+    type=click.Choice(sorted(LABELS)),
+    required=True,
+    help="Classifier to put the pre-filter in front of",
+)
+@click.option(
+    "--labels",
+    "labels_csv",
+    type=click.Path(exists=True, dir_okay=False),
+    help="CSV with text and label columns, instead of scoring a sample",
+)
+@click.option(
+    "--sample",
+    default=DEFAULT_SAMPLE,
+    show_default=True,
+    help="Captions to sample from TRANSCRIPTS and score with the full model",
+)
+@click.option(
+    "--max-recall-loss",
+    type=click.FloatRange(0, 1, max_open=True),
+    default=DEFAULT_MAX_RECALL_LOSS,
+    show_default=True,
+    help="Share of positive sentences the pre-filter may skip",
+)
+@click.option(
+    "--batch-size",
+    default=DEFAULT_BATCH_SIZE,
+    show_default=True,
+    help="Sentences per model forward pass",
+)
+@click.option(
+    "--cache/--no-cache",
+    default=True,
+    show_default=True,
+    help="Reuse scores from the shared classification cache",
+)
+@click.option(
+    "--backend",
+    type=click.Choice(BACKENDS),
+    default="torch",
+    show_default=True,
+    help="CPU inference backend",
+)
+@click.option("--seed", default=0, show_default=True, help="Sampling random seed")
+@click.argument("transcripts", nargs=-1, type=click.Path(exists=True))
+def main(
+    model,
+    labels_csv,
+    sample,
+    max_recall_loss,
+    batch_size,
+    cache,
+    backend,
+    seed,
+    transcripts,
+):
+    """Train and calibrate the lexical pre-filter for a classifier."""
+    rng = random.Random(seed)
+    if labels_csv:
+        texts, positives = read_labeled(labels_csv, LABELS[model][0])
+    elif transcripts:
+        texts = sample_captions(transcripts, sample, rng)
+        positives = score_with_model(texts, model, backend, batch_size, cache)
+    else:
+        raise click.UsageError("Pass --labels, or transcript paths to sample.")
+
+    order = list(range(len(texts)))
+    rng.shuffle(order)
+    split = int(len(order) * (1 - HOLDOUT_FRACTION))
+    train_ids, holdout_ids = order[:split], order[split:]
+    if not any(positives[i] for i in holdout_ids):
+        raise click.ClickException(
+            "The held-out sample has no positive sentences; use a larger sample."
+        )
+
+    weights, bias = train(
+        [texts[i] for i in train_ids], [positives[i] for i in train_ids]
+    )
+    triage = TriageModel(model, weights, bias, 0.0)
+    probabilities = np.asarray(triage.probabilities([texts[i] for i in holdout_ids]))
+    held_out = np.asarray([positives[i] for i in holdout_ids], dtype=bool)
+
+    print(
+        f"Held out {len(holdout_ids):,} sentences, {held_out.sum():,} positive "
+        f"({held_out.mean():.1%})"
+    )
+    print(f"{'Recall loss':>12} {'Threshold':>10} {'Skipped':>8} {'Missed':>7}")
+    for loss in sorted({*REPORTED_LOSSES, max_recall_loss}):
+        threshold = recall_loss_threshold(probabilities, held_out, loss)
+        skipped = probabilities < threshold
+        missed = int((skipped & held_out).sum())
+        marker = "  <- saved" if loss == max_recall_loss else ""
+        print(
+            f"{loss:>12.1%} {threshold:>10.4f} {skipped.mean():>8.1%} "
+            f"{missed:>7,}{marker}"
+        )
+
+    triage.threshold = recall_loss_threshold(probabilities, held_out, max_recall_loss)
+    if max_recall_loss == 0:
+        print("With a 0% recall loss budget, the saved model skips nothing.")
+    elif triage.threshold == 0:
+        needed = math.ceil(1 / max_recall_loss) - 1
+        print(
+            f"Warning: {held_out.sum():,} held-out positives cannot support a "
+            f"{max_recall_loss:.1%} recall loss (at least {needed:,} are needed), "
+            "so the saved model skips nothing. Use a larger sample."
+        )
+    triage.save(triage_path(model))
+    print(f"Saved triage model to {triage_path(model)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""
+Streaming WebVTT parser.
+
+Reads cues line by line and returns caption text alongside float64 arrays of
+start and end times in seconds, without building an object per caption or
+round-tripping timestamps through strings. Cue identifiers, settings, NOTE,
+STYLE and REGION blocks are skipped and cue tags are stripped, matching the
+text webvtt-py returns.
+
+Compare it with webvtt-py on real transcripts, or on a synthetic multi-hour
+one when no paths are given:
+
+    python -m manowhisper.vtt "/data/Tate Speech/vtt"
+"""
+
+import os
+import re
+import tempfile
+import time
+from array import array
+from collections import namedtuple
+
+import click
+
+Captions = namedtuple("Captions", ["texts", "starts", "ends"])
+
+TAG = re.compile(r"<[^>]*>")
+
+
+def parse_timestamp(value):
+    """Seconds from an hh:mm:ss.ttt or mm:ss.ttt timestamp."""
+    parts = value.split(":")
+    if len(parts) == 3:
+        return int(parts[0]) * 3600 + int(parts[1]) * 60 + float(parts[2])
+    return int(parts[0]) * 60 + float(parts[1])
+
+
+def cue_text(lines):
+    text = " ".join(lines)
+    if "<" in text:
+        text = TAG.sub("", text).strip()
+    return text
+
+
+def iter_captions(path):
+    """
+    Yield (start, end, text) for each cue in a WebVTT file, in file order.
+
+    Multi-line cue text is joined with single spaces.
+    """
+    with open(path, encoding="utf-8-sig") as f:
+        if not f.readline().startswith("WEBVTT"):
+            raise ValueError(f"{path} is not a WebVTT file.")
+
+        timing = None
+        lines = []
+        for line in f:
+            line = line.strip()
+            if not line:
+                # Like webvtt-py, cues without any text lines are dropped.
+                if lines:
+                    yield timing[0], timing[1], cue_text(lines)
+                    lines = []
+                timing = None
+            elif timing is not None:
+                lines.append(line)
+            elif "-->" in line:
+                start, _, rest = line.partition("-->")
+                # Cue settings may follow the end time.
+                timing = (parse_timestamp(start), parse_timestamp(rest.split()[0]))
+            # Anything else is a cue identifier or a NOTE/STYLE/REGION block.
+
+        if lines:
+            yield timing[0], timing[1], cue_text(lines)
+
+
+def read_vtt(path, skip_empty=False):
+    """Return a file's Captions: text list plus float64 start and end arrays."""
+    texts = []
+    starts = array("d")
+    ends = array("d")
+    for start, end, text in iter_captions(path):
+        if skip_empty and not text:
+            continue
+        texts.append(text)
+        starts.append(start)
+        ends.append(end)
+    return Captions(texts, starts, ends)
+
+
+def read_text(path):
+    """A transcript's caption text joined into a single string."""
+    return " ".join(read_vtt(path).texts)
+
+
+def write_synthetic_vtt(path, hours):
+    """Write a transcript of four-second, two-line cues lasting the given hours."""
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("WEBVTT\n\n")
+        for i in range(int(hours * 3600 / 4)):
+            start = i * 4
+            f.write(
+                f"{i + 1}\n"
+                f"{start // 3600:02}:{start // 60 % 60:02}:{start % 60:02}.000 --> "
+                f"{(start + 4) // 3600:02}:{(start + 4) // 60 % 60:02}:"
+                f"{(start + 4) % 60:02}.500\n"
+                f"Caption number {i} of a long episode,\n"
+                "wrapped over a second line.\n\n"
+            )
+
+
+def read_with_webvtt(path):
+    import webvtt
+
+    texts = []
+    starts = []
+    ends = []
+    for caption in webvtt.read(path):
+        texts.append(caption.text.strip().replace("\n", " "))
+        starts.append(caption.start_in_seconds)
+        ends.append(caption.end_in_seconds)
+    return texts, starts, ends
+
+
+def best_time(func, paths, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for path in paths:
+            func(path)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+@click.command()
+@click.option(
+    "--hours",
+    default=3.0,
+    show_default=True,
+    help="Length of the synthetic transcript used when no paths are given",
+)
+@click.option("--repeat", default=3, show_default=True, help="Timed runs per parser")
+@click.argument("paths", nargs=-1, type=click.Path(exists=True))
+def main(hours, repeat, paths):
+    """Benchmark this parser against webvtt-py."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(
+                os.path.join(path, f)
+                for f in sorted(os.listdir(path))
+                if f.endswith(".vtt")
+            )
+        else:
+            files.append(path)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if not files:
+            files = [os.path.join(tmp, "synthetic.vtt")]
+            write_synthetic_vtt(files[0], hours)
+            print(f"Synthetic transcript: {hours:g} hours")
+
+        captions = sum(len(read_vtt(path).texts) for path in files)
+        print(f"{len(files):,} files, {captions:,} captions")
+
+        fast = best_time(read_vtt, files, repeat)
+        print(f"  manowhisper.vtt: {fast:.3f}s ({captions / fast:,.0f} captions/s)")
+
+        try:
+            slow = best_time(read_with_webvtt, files, repeat)
+        except ImportError:
+            print("  webvtt-py is not installed; skipping comparison.")
+            return
+        print(f"  webvtt-py:       {slow:.3f}s ({captions / slow:,.0f} captions/s)")
+        print(f"  Speedup:         {slow / fast:.1f}x")
+
+        # webvtt-py truncates *_in_seconds to whole seconds in recent releases.
+        mismatched = 0
+        for path in files:
+            ours = read_vtt(path)
+            texts, starts, ends = read_with_webvtt(path)
+            mismatched += ours.texts != texts or any(
+                abs(a - b) >= 1 for a, b in zip(ours.starts + ours.ends, starts + ends)
+            )
+        print(f"  Files that differ: {mismatched}")
+
+
+if __name__ == "__main__":
+    main()
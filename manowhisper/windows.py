@@ -0,0 +1,94 @@
+"""
+Token-based sliding windows for classifying texts longer than the model input.
+
+Long texts (episode summaries, whole transcripts) are cut into windows that
+fill the model's token limit, overlapping by a stride so nothing said at a
+boundary is lost. Windows end on word boundaries and are returned as slices
+of the original text, so they can go to the pipeline in one batched call.
+Scores are then averaged across windows, weighted by each window's length.
+"""
+
+import re
+from collections import defaultdict
+
+DEFAULT_MAX_TOKENS = 512
+DEFAULT_STRIDE = 32
+# How far a window end may back off to avoid splitting a word.
+MAX_BACKOFF = 16
+# Rough subword tokens per word, for pipelines without a local tokenizer.
+TOKENS_PER_WORD = 1.3
+WORD = re.compile(r"\S+")
+
+
+def window_budget(tokenizer, max_tokens=None):
+    """Tokens of text that fit in one window, leaving room for special tokens."""
+    limit = getattr(tokenizer, "model_max_length", None) or DEFAULT_MAX_TOKENS
+    max_tokens = min(max_tokens or DEFAULT_MAX_TOKENS, limit)
+    return max_tokens - tokenizer.num_special_tokens_to_add()
+
+
+def token_spans(text, tokenizer):
+    """Character (start, end) of each token, or of each word without a fast tokenizer."""
+    if tokenizer is not None and getattr(tokenizer, "is_fast", False):
+        encoded = tokenizer(
+            text,
+            add_special_tokens=False,
+            truncation=False,
+            return_offsets_mapping=True,
+        )
+        return [tuple(span) for span in encoded["offset_mapping"]]
+    return [match.span() for match in WORD.finditer(text)]
+
+
+def token_windows(text, tokenizer, max_tokens=None, stride=DEFAULT_STRIDE):
+    """
+    Split text into overlapping windows of at most max_tokens tokens.
+
+    Returns (window text, token count) pairs. Consecutive windows share
+    stride tokens. Without a fast tokenizer, words stand in for tokens.
+    """
+    spans = token_spans(text, tokenizer)
+    if tokenizer is not None and getattr(tokenizer, "is_fast", False):
+        size = window_budget(tokenizer, max_tokens)
+    else:
+        size = int((max_tokens or DEFAULT_MAX_TOKENS) / TOKENS_PER_WORD)
+    stride = min(stride, size // 2)
+
+    windows = []
+    start = 0
+    while start < len(spans):
+        end = min(start + size, len(spans))
+        if end < len(spans):
+            # Back off to a token that starts a new word.
+            cut = end
+            while cut > end - MAX_BACKOFF and cut > start + 1:
+                if spans[cut][0] > spans[cut - 1][1]:
+                    break
+                cut -= 1
+            else:
+                cut = end
+            end = cut
+        windows.append((text[spans[start][0] : spans[end - 1][1]], end - start))
+        if end == len(spans):
+            break
+        start = max(end - stride, start + 1)
+    return windows
+
+
+def aggregate_windows(window_results, lengths=None):
+    """
+    Average each label's score over windows, weighted by lengths if given.
+
+    window_results holds one pipeline result per window: a label dict or a
+    list of them.
+    """
+    if not window_results:
+        return {}
+    lengths = lengths or [1] * len(window_results)
+    total = sum(lengths)
+
+    scores = defaultdict(float)
+    for result, length in zip(window_results, lengths):
+        for entry in result if isinstance(result, list) else [result]:
+            scores[entry["label"]] += entry["score"] * length
+    return {label: score / total for label, score in scores.items()}
@@ -0,0 +1,166 @@
+"""
+Process pool helpers for spreading classification across CPU cores.
+
+Each worker is pinned to its own set of cores and sets torch's intra-op
+thread count to match, so N workers x M threads never oversubscribe the box.
+When processes are forked, the model is loaded once in the parent and its
+weights are shared read-only with every worker instead of copied.
+"""
+
+import functools
+import multiprocessing
+import os
+import queue
+
+from manowhisper.cache import open_cache
+
+# Per-process state populated by the pool initializer.
+_worker = {}
+# How long a starting worker waits for a free core slot before running unpinned.
+SLOT_TIMEOUT = 1
+
+
+def available_cores():
+    """Cores this process is allowed to run on."""
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def worker_cores(index, threads_per_worker, cores):
+    """Pick a disjoint block of cores for a worker, wrapping if oversubscribed."""
+    start = index * threads_per_worker
+    return [cores[(start + i) % len(cores)] for i in range(threads_per_worker)]
+
+
+def pin_worker(index, threads_per_worker, cores):
+    """
+    Pin the current process to its cores and size torch's thread pools.
+    With index None, the process is left on every core.
+    """
+    if index is not None and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, worker_cores(index, threads_per_worker, cores))
+
+    import torch
+
+    torch.set_num_threads(threads_per_worker)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        # Already fixed once any parallel work has run in this process.
+        pass
+
+
+def memory_usage():
+    """Resident, proportional and shared memory of this process in bytes."""
+    try:
+        import psutil
+    except ImportError:
+        import resource
+
+        # ru_maxrss is reported in kilobytes on Linux.
+        return {"rss": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024}
+
+    info = psutil.Process().memory_full_info()
+    usage = {"rss": info.rss}
+    if hasattr(info, "pss"):
+        usage["pss"] = info.pss
+    if hasattr(info, "shared"):
+        usage["shared"] = info.shared
+    return usage
+
+
+def print_memory_report(usage):
+    """Print the latest memory figures reported by each worker."""
+    for pid, stats in sorted(usage.items()):
+        figures = ", ".join(
+            f"{name.upper()} {value / 1024**2:,.0f} MB" for name, value in stats.items()
+        )
+        print(f"Worker {pid}: {figures}")
+
+
+def load_shared(load):
+    """
+    Load a pipeline in the parent and move its weights into shared memory.
+
+    Forked workers then map the same pages rather than each holding a copy.
+    """
+    model_pipeline = load()
+    # ONNX Runtime sessions have no torch storages to move; forking still
+    # shares their pages copy-on-write. Daemon clients hold no weights.
+    if hasattr(getattr(model_pipeline, "model", None), "share_memory"):
+        model_pipeline.model.share_memory()
+    return model_pipeline
+
+
+def _init_worker(slots, threads_per_worker, cores, load, use_cache):
+    try:
+        index = slots.get(timeout=SLOT_TIMEOUT)
+    except queue.Empty:
+        # A replacement for a worker that died still holding its slot.
+        index = None
+    pin_worker(index, threads_per_worker, cores)
+    if "pipeline" not in _worker:
+        _worker["pipeline"] = load()
+    _worker["cache"] = open_cache(use_cache)
+
+
+def _run(func, item):
+    result = func(item, _worker["pipeline"], _worker["cache"])
+    return os.getpid(), memory_usage(), result
+
+
+def pool_context():
+    """Prefer fork so workers start quickly and inherit the parent's imports."""
+    if "fork" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("fork")
+    return multiprocessing.get_context()
+
+
+def imap_workers(
+    func,
+    items,
+    load,
+    workers,
+    threads_per_worker=1,
+    use_cache=True,
+    share_weights=True,
+):
+    """
+    Apply func(item, model_pipeline, cache) to items across a process pool.
+
+    load is a picklable callable that builds the pipeline. With fork and
+    share_weights, it runs once in the parent; otherwise each worker calls
+    it. Results are yielded in the order of items, and each worker's memory
+    use is reported once the pool finishes.
+    """
+    ctx = pool_context()
+    forked = ctx.get_start_method() == "fork"
+    if share_weights and forked:
+        _worker["pipeline"] = load_shared(load)
+
+    cores = available_cores()
+    if workers * threads_per_worker > len(cores):
+        print(
+            f"Warning: {workers} workers x {threads_per_worker} threads exceeds "
+            f"{len(cores)} available cores."
+        )
+
+    slots = ctx.Queue()
+    for index in range(workers):
+        slots.put(index)
+
+    usage = {}
+    try:
+        with ctx.Pool(
+            workers,
+            initializer=_init_worker,
+            initargs=(slots, threads_per_worker, cores, load, use_cache),
+        ) as pool:
+            for pid, stats, result in pool.imap(functools.partial(_run, func), items):
+                usage[pid] = stats
+                yield result
+    finally:
+        _worker.pop("pipeline", None)
+
+    print_memory_report(usage)
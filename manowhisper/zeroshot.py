@@ -0,0 +1,250 @@
+"""
+Chunked, cached zero-shot classification of whole transcripts.
+
+The zero-shot pipeline truncates long inputs, so a multi-hour episode was
+labeled from its first few minutes. Here a transcript is cut into token
+windows, every (chunk, hypothesis) pair goes through the NLI model in
+length-sorted batches, and each chunk's label distribution is averaged over
+the episode, weighted by chunk length.
+
+The NLI logits for each pair are kept in the shared score cache, keyed by
+the chunk's text hash and the hypothesis. Adding a label to a run only
+scores the new label's pairs; chunks and labels seen before are free.
+
+With a Cascade, a distilled NLI model scores every chunk first, and only
+chunks whose top two labels are within a margin go to the large model.
+"""
+
+import numpy as np
+
+from manowhisper.cache import pipeline_identity, text_hash
+from manowhisper.inference import DEFAULT_BATCH_SIZE, length_sorted_batches
+from manowhisper.windows import token_windows
+
+ZERO_SHOT_MODEL = "facebook/bart-large-mnli"
+DEFAULT_HYPOTHESIS_TEMPLATE = "This example is {}."
+# Premise tokens per chunk, leaving room for the hypothesis.
+DEFAULT_CHUNK_TOKENS = 400
+# Distilled from bart-large-mnli, with the same tokenizer and labels.
+DEFAULT_SMALL_MODEL = "valhalla/distilbart-mnli-12-1"
+DEFAULT_MARGIN = 0.2
+
+
+def nli_label_ids(model_pipeline):
+    """Indices of the (contradiction, entailment) logits, as the pipeline uses them."""
+    entailment = model_pipeline.entailment_id
+    contradiction = -1 if entailment == 0 else 0
+    return contradiction, entailment
+
+
+def pair_key(premise, hypothesis):
+    return f"{text_hash(premise)}/{text_hash(hypothesis)}"
+
+
+def transcript_chunks(
+    text, model_pipeline, chunk_tokens=DEFAULT_CHUNK_TOKENS, stride=0
+):
+    """(chunk text, token count) windows covering the whole transcript."""
+    return token_windows(text, model_pipeline.tokenizer, chunk_tokens, stride)
+
+
+def forward_pairs(model_pipeline, premises, hypotheses):
+    """[contradiction, entailment] logits for a batch of premise/hypothesis pairs."""
+    import torch
+
+    tokenizer = model_pipeline.tokenizer
+    batch = tokenizer(
+        premises,
+        hypotheses,
+        truncation="only_first",
+        padding=True,
+        return_tensors="pt",
+    )
+    device = getattr(model_pipeline, "device", None)
+    if device is not None:
+        batch = {name: tensor.to(device) for name, tensor in batch.items()}
+    with torch.inference_mode():
+        logits = model_pipeline.model(**batch).logits
+    ids = [i % logits.shape[-1] for i in nli_label_ids(model_pipeline)]
+    return logits[:, ids].float().cpu().tolist()
+
+
+def nli_logits(
+    pairs, lengths, model_pipeline, batch_size=DEFAULT_BATCH_SIZE, cache=None, bar=None
+):
+    """
+    [contradiction, entailment] logits for each (premise, hypothesis) pair.
+
+    lengths gives each pair's premise length in tokens for batching. Cached
+    pairs and repeated pairs are only scored once.
+    """
+    keys = [pair_key(premise, hypothesis) for premise, hypothesis in pairs]
+    found = {}
+    if cache is not None:
+        model_id, revision = pipeline_identity(model_pipeline)
+        found = cache.get_many(model_id, revision, keys)
+
+    pending = {}
+    for i, key in enumerate(keys):
+        if key not in found and key not in pending:
+            pending[key] = i
+    if bar is not None:
+        bar(len(keys) - len(pending))
+
+    indices = list(pending.values())
+    scored = {}
+    for batch in length_sorted_batches([lengths[i] for i in indices], batch_size):
+        batch = [indices[j] for j in batch]
+        logits = forward_pairs(
+            model_pipeline,
+            [pairs[i][0] for i in batch],
+            [pairs[i][1] for i in batch],
+        )
+        for i, pair_logits in zip(batch, logits):
+            scored[keys[i]] = pair_logits
+        if bar is not None:
+            bar(len(batch))
+
+    if cache is not None and scored:
+        cache.put_many(model_id, revision, list(scored.items()))
+    found.update(scored)
+    return [found[key] for key in keys]
+
+
+def label_probabilities(logits, multi_label=False):
+    """
+    Per-chunk label scores from a chunks x labels x 2 array of logits, as the
+    zero-shot pipeline computes them: a softmax of entailment logits across
+    labels, or with multi_label or a single label, entailment against
+    contradiction per label.
+    """
+    contradiction, entailment = logits[..., 0], logits[..., 1]
+    if multi_label or logits.shape[-2] == 1:
+        return 1 / (1 + np.exp(contradiction - entailment))
+    exp = np.exp(entailment - entailment.max(axis=-1, keepdims=True))
+    return exp / exp.sum(axis=-1, keepdims=True)
+
+
+def aggregate_chunks(probabilities, lengths):
+    """Average chunk label scores over an episode, weighted by chunk length."""
+    weights = np.asarray(lengths, dtype=float)
+    return weights @ probabilities / weights.sum()
+
+
+def classify_chunks(
+    chunks,
+    candidate_labels,
+    model_pipeline,
+    hypothesis_template=DEFAULT_HYPOTHESIS_TEMPLATE,
+    batch_size=DEFAULT_BATCH_SIZE,
+    cache=None,
+    multi_label=False,
+    bar=None,
+):
+    """
+    Chunk x label probabilities for (chunk text, token count) chunks.
+
+    Every chunk is paired with every label's hypothesis.
+    """
+    hypotheses = [hypothesis_template.format(label) for label in candidate_labels]
+    pairs = [(text, hypothesis) for text, _ in chunks for hypothesis in hypotheses]
+    lengths = [length for _, length in chunks for _ in hypotheses]
+    logits = nli_logits(pairs, lengths, model_pipeline, batch_size, cache, bar)
+    logits = np.asarray(logits, dtype=float).reshape(len(chunks), len(hypotheses), 2)
+    return label_probabilities(logits, multi_label)
+
+
+def top_two_margin(probabilities):
+    """Gap between each chunk's best and second-best label scores."""
+    if probabilities.shape[-1] < 2:
+        return np.ones(probabilities.shape[0])
+    top = np.sort(probabilities, axis=-1)[..., -2:]
+    return top[..., 1] - top[..., 0]
+
+
+class Cascade:
+    """
+    Escalate chunks the small model is unsure about to a larger model.
+
+    Chunks whose top-two label margin from the small model is below margin
+    are rescored by the large model. Counts are kept across transcripts.
+    """
+
+    def __init__(self, large_pipeline, margin=DEFAULT_MARGIN):
+        self.large_pipeline = large_pipeline
+        self.margin = margin
+        self.chunks = 0
+        self.escalated = 0
+        self.agreed = 0
+
+    def classify(self, chunks, probabilities, classify_large):
+        """
+        Replace the scores of uncertain chunks with classify_large's, which
+        takes a list of chunks and returns their probabilities.
+        """
+        uncertain = np.flatnonzero(top_two_margin(probabilities) < self.margin)
+        self.chunks += len(chunks)
+        self.escalated += len(uncertain)
+        if not len(uncertain):
+            return probabilities
+
+        large = classify_large([chunks[i] for i in uncertain])
+        self.agreed += int(
+            (probabilities[uncertain].argmax(-1) == large.argmax(-1)).sum()
+        )
+        probabilities = probabilities.copy()
+        probabilities[uncertain] = large
+        return probabilities
+
+    def stats(self):
+        rate = self.escalated / self.chunks if self.chunks else 0
+        agreement = self.agreed / self.escalated if self.escalated else 1
+        return (
+            f"Cascade: {self.escalated:,} of {self.chunks:,} chunks escalated to "
+            f"the large model ({rate:.1%}); the small model's top label agreed "
+            f"on {agreement:.1%} of them"
+        )
+
+
+def classify_transcript(
+    text,
+    candidate_labels,
+    model_pipeline,
+    hypothesis_template=DEFAULT_HYPOTHESIS_TEMPLATE,
+    chunk_tokens=DEFAULT_CHUNK_TOKENS,
+    stride=0,
+    batch_size=DEFAULT_BATCH_SIZE,
+    cache=None,
+    multi_label=False,
+    cascade=None,
+):
+    """
+    {label: score} for a whole transcript, averaged over its chunks.
+
+    With a Cascade, model_pipeline is the small model and uncertain chunks
+    are rescored by the cascade's large model.
+    """
+    chunks = transcript_chunks(text, model_pipeline, chunk_tokens, stride)
+    if not chunks:
+        return {}
+
+    def classify(classifier, subset):
+        return classify_chunks(
+            subset,
+            candidate_labels,
+            classifier,
+            hypothesis_template,
+            batch_size,
+            cache,
+            multi_label,
+        )
+
+    probabilities = classify(model_pipeline, chunks)
+    if cascade is not None:
+        probabilities = cascade.classify(
+            chunks,
+            probabilities,
+            lambda uncertain: classify(cascade.large_pipeline, uncertain),
+        )
+    scores = aggregate_chunks(probabilities, [length for _, length in chunks])
+    return dict(zip(candidate_labels, scores.tolist()))
@@ -1,13 +1,25 @@
+import functools
 import os
-import time
 from collections import defaultdict
 
 import click
 import gspread
-import webvtt
 from alive_progress import alive_bar
 from oauth2client.service_account import ServiceAccountCredentials
-from transformers import pipeline
+
+from manowhisper.backends import BACKENDS
+from manowhisper.cache import open_cache
+from manowhisper.checkpoint import Checkpoint, default_run_dir
+from manowhisper.corpus import list_transcripts, read_transcript
+from manowhisper.inference import DEFAULT_BATCH_SIZE, classify_batched
+from manowhisper.models import load_pipeline
+from manowhisper.stages import (
+    DEFAULT_QUEUE_DEPTH,
+    DEFAULT_READERS,
+    StagedRun,
+    classify_staged,
+)
+from manowhisper.workers import imap_workers
 
 
 def setup_google_sheets(sheet_id, keyfile_path, sheet_name):
@@ -24,18 +36,15 @@ def setup_google_sheets(sheet_id, keyfile_path, sheet_name):
 
 def parse_vtt_file(vtt_file):
     """Extract sentences from transcripts."""
-    sentences = [
-        caption.text.strip().replace("\n", " ") for caption in webvtt.read(vtt_file)
-    ]
-    return sentences
+    return read_transcript(vtt_file).texts
 
 
-def classify_emotions(sentences, model_pipeline):
+def aggregate_emotions(sentence_results):
+    """Average each emotion's score over a transcript's sentences."""
     aggregated_scores = defaultdict(float)
-    total_sentences = len(sentences) or 1
+    total_sentences = len(sentence_results) or 1
 
-    for sentence in sentences:
-        results = model_pipeline(sentence)
+    for results in sentence_results:
         if results and isinstance(results[0], list):
             results = results[0]
         for entry in results:
@@ -47,12 +56,96 @@ def classify_emotions(sentences, model_pipeline):
     return aggregated_scores
 
 
+def classify_emotions(
+    sentences, model_pipeline, batch_size=DEFAULT_BATCH_SIZE, cache=None
+):
+    return aggregate_emotions(
+        classify_batched(sentences, model_pipeline, batch_size, cache=cache)
+    )
+
+
+def classify_vtt_file(
+    file_path, model_pipeline, cache=None, batch_size=DEFAULT_BATCH_SIZE
+):
+    """Average emotion scores over a single transcript."""
+    sentences = parse_vtt_file(file_path)
+    return dict(classify_emotions(sentences, model_pipeline, batch_size, cache))
+
+
 @click.command()
 @click.argument("vtt_directory", type=click.Path(exists=True))
 @click.argument("keyfile_path", type=click.Path(exists=True))
 @click.argument("sheet_id")
 @click.argument("sheet_name")
-def main(vtt_directory, keyfile_path, sheet_id, sheet_name):
+@click.option(
+    "--batch-size",
+    default=DEFAULT_BATCH_SIZE,
+    show_default=True,
+    help="Sentences per model forward pass",
+)
+@click.option(
+    "--cache/--no-cache",
+    default=True,
+    show_default=True,
+    help="Reuse scores from the shared classification cache",
+)
+@click.option(
+    "--workers",
+    default=1,
+    show_default=True,
+    help="Worker processes to shard VTT files across",
+)
+@click.option(
+    "--threads-per-worker",
+    default=1,
+    show_default=True,
+    help="Torch threads, and pinned cores, for each worker",
+)
+@click.option(
+    "--backend",
+    type=click.Choice(BACKENDS),
+    default="torch",
+    show_default=True,
+    help="CPU inference backend",
+)
+@click.option(
+    "--checkpoint-dir",
+    type=click.Path(file_okay=False),
+    help="Run checkpoints  [default: emotions-SHEET_ID-SHEET_NAME.parts]",
+)
+@click.option(
+    "--resume/--no-resume",
+    default=True,
+    show_default=True,
+    help="Skip transcripts already scored by an earlier run",
+)
+@click.option(
+    "--readers",
+    default=DEFAULT_READERS,
+    show_default=True,
+    help="Threads reading upcoming transcripts while the model runs",
+)
+@click.option(
+    "--queue-depth",
+    default=DEFAULT_QUEUE_DEPTH,
+    show_default=True,
+    help="Transcripts read and tokenized ahead of the model",
+)
+def main(
+    vtt_directory,
+    keyfile_path,
+    sheet_id,
+    sheet_name,
+    batch_size,
+    cache,
+    workers,
+    threads_per_worker,
+    backend,
+    checkpoint_dir,
+    resume,
+    readers,
+    queue_depth,
+):
     """
     Analyze emotions in podcast transcripts and store results in Google Sheets.
 
@@ -60,11 +153,6 @@ def main(vtt_directory, keyfile_path, sheet_id, sheet_name):
       python emotional-corpus.py /path/to/vtt/files keyfile.json google_sheet_id sheet_name
     """
     sheet = setup_google_sheets(sheet_id, keyfile_path, sheet_name)
-    model_pipeline = pipeline(
-        "text-classification",
-        model="j-hartmann/emotion-english-distilroberta-base",
-        top_k=None,
-    )
 
     emotion_labels = [
         "anger",
@@ -76,23 +164,77 @@ def main(vtt_directory, keyfile_path, sheet_id, sheet_name):
         "surprise",
     ]
 
-    sheet.update(values=[["filename"] + emotion_labels], range_name="A1:H1")
-
-    vtt_files = [f for f in os.listdir(vtt_directory) if f.endswith(".vtt")]
-
-    with alive_bar(len(vtt_files), title="Processing transcripts") as bar:
-        for vtt_file in vtt_files:
-            file_path = os.path.join(vtt_directory, vtt_file)
-            sentences = parse_vtt_file(file_path)
-            emotion_scores = classify_emotions(sentences, model_pipeline)
-
-            row = [vtt_file] + [
-                round(emotion_scores.get(label, 0), 4) for label in emotion_labels
-            ]
-            sheet.append_row(row)
-
-            bar()
-            time.sleep(1)
+    file_paths = list_transcripts(vtt_directory)
+    checkpoint_dir = checkpoint_dir or default_run_dir(
+        f"emotions-{sheet_id}-{sheet_name}".replace(os.sep, "_")
+    )
+    checkpoint = Checkpoint(
+        checkpoint_dir, {"model": "emotion", "backend": backend}, resume
+    )
+    pending = [f for f in file_paths if not checkpoint.is_done(f)]
+    if len(pending) < len(file_paths):
+        print(
+            f"Resuming: {len(file_paths) - len(pending)} of {len(file_paths)} "
+            "transcripts already scored"
+        )
+
+    run = None
+    if not pending:
+        results = []
+        cache = None
+    elif workers > 1:
+        results = imap_workers(
+            functools.partial(classify_vtt_file, batch_size=batch_size),
+            pending,
+            functools.partial(load_pipeline, "emotion", backend),
+            workers,
+            threads_per_worker,
+            cache,
+        )
+        cache = None
+    else:
+        model_pipeline = load_pipeline("emotion", backend)
+        cache = open_cache(cache)
+        run = StagedRun()
+        results = (
+            dict(aggregate_emotions(sentence_results))
+            for sentence_results in classify_staged(
+                pending,
+                parse_vtt_file,
+                model_pipeline,
+                batch_size,
+                cache=cache,
+                readers=readers,
+                depth=queue_depth,
+                run=run,
+            )
+        )
+
+    with checkpoint:
+        with alive_bar(len(pending), title="Processing transcripts") as bar:
+            for emotion_scores, file_path in zip(results, pending):
+                row = [os.path.basename(file_path)] + [
+                    round(emotion_scores.get(label, 0), 4) for label in emotion_labels
+                ]
+                checkpoint.record(file_path, [row])
+                bar()
+
+        rows = [
+            [row[0]] + [float(score) for score in row[1:]]
+            for row in checkpoint.iter_rows(file_paths)
+        ]
+
+    # One write of the whole table, so rerunning never duplicates rows.
+    # Clear first so rows from a longer earlier table do not linger below it.
+    sheet.clear()
+    sheet.update(values=[["filename"] + emotion_labels] + rows, range_name="A1")
+    print(f"Wrote {len(rows)} rows to {sheet_name}")
+
+    if run:
+        print(f"Pipeline stages:\n{run.report()}")
+    if cache:
+        print(cache.stats())
+        cache.close()
 
 
 if __name__ == "__main__":
@@ -1,80 +1,306 @@
 import csv as csv_module
+import functools
 import os
+import sys
 from datetime import datetime
 from pathlib import Path
 
 import click
 import pandas as pd
 import plotly.graph_objects as go
-import webvtt
 from alive_progress import alive_bar
 from plotly.subplots import make_subplots
-from transformers import pipeline
+
+from manowhisper.backends import BACKENDS
+from manowhisper.cache import open_cache
+from manowhisper.checkpoint import Checkpoint, default_run_dir
+from manowhisper.corpus import list_transcripts
+from manowhisper.estimate import (
+    DEFAULT_CI_WIDTH,
+    DEFAULT_CONFIDENCE,
+    describe_estimate,
+    estimate_proportion,
+)
+from manowhisper.inference import DEFAULT_BATCH_SIZE, classify_batched
+from manowhisper.models import load_pipeline
+from manowhisper.scores import (
+    SCORE_FORMATS,
+    show_label_counts,
+    summary_path,
+    write_scores,
+)
+from manowhisper.segment import SEGMENT_MODES, read_segments
+from manowhisper.stages import (
+    DEFAULT_QUEUE_DEPTH,
+    DEFAULT_READERS,
+    StagedRun,
+    classify_staged,
+)
+from manowhisper.triage import load_triage
+from manowhisper.workers import imap_workers
 
 
 def extract_show_name(vtt_path):
     return Path(vtt_path).parent.name
 
 
-def parse_vtt_files(input_path):
-    sentences = []
-    filenames = []
+def parse_vtt_file(filepath, segment="caption"):
+    return read_segments(filepath, segment).texts
 
-    vtt_files = [
-        os.path.join(input_path, f)
-        for f in os.listdir(input_path)
-        if f.endswith(".vtt")
-    ]
-    for filepath in vtt_files:
-        for caption in webvtt.read(filepath):
-            text = caption.text.strip().replace("\n", " ")
-            if text:
-                sentences.append(text)
-                filenames.append(filepath)
-
-    return sentences, filenames
-
-
-def classify_misogyny(sentences, model_pipeline):
-    labels = []
-    scores = []
-    with alive_bar(len(sentences), title="Classifying") as bar:
-        for sentence in sentences:
-            result = model_pipeline(sentence)
-            label = result[0]["label"]
-            score = result[0]["score"]
-            labels.append(label)
-            scores.append(score)
-            bar()
-    return scores, labels
-
-
-def write_classification_to_csv(shows, output_csv):
-    model_pipeline = pipeline(
-        "text-classification", model="MilaNLProc/bert-base-uncased-ear-misogyny"
+
+def classify_vtt_file(
+    filepath,
+    model_pipeline,
+    cache=None,
+    batch_size=DEFAULT_BATCH_SIZE,
+    segment="caption",
+    triage=False,
+):
+    """
+    Classify a single transcript in a worker. Also returns how many of its
+    sentences triage skipped and how many it has, for the parent to report.
+    """
+    triage_model = load_triage("misogyny") if triage else None
+    skipped = triage_model.skipped if triage_model else 0
+    sentences = parse_vtt_file(filepath, segment)
+    results = classify_batched(
+        sentences,
+        model_pipeline,
+        batch_size,
+        cache=cache,
+        triage=triage_model,
+    )
+    if triage_model:
+        skipped = triage_model.skipped - skipped
+    return (
+        [(result[0]["score"], result[0]["label"]) for result in results],
+        skipped,
+        len(sentences),
     )
 
-    all_data = []
+
+def list_show_files(shows):
+    """(show name, transcript path) pairs, with each show name interned once."""
+    vtt_files = []
     for show_path in shows:
-        show_name = os.path.basename(os.path.dirname(show_path))
-        sentences, filenames = parse_vtt_files(show_path)
-        scores, labels = classify_misogyny(sentences, model_pipeline)
-        for fn, lbl, sc in zip(filenames, labels, scores):
-            all_data.append(
-                {"filename": fn, "label": lbl, "score": sc, "show": show_name}
-            )
+        show_name = sys.intern(os.path.basename(os.path.dirname(show_path)))
+        vtt_files.extend((show_name, fp) for fp in list_transcripts(show_path))
+    return vtt_files
+
+
+def classify_files(
+    filepaths,
+    batch_size=DEFAULT_BATCH_SIZE,
+    use_cache=True,
+    backend="torch",
+    segment="caption",
+    triage=False,
+    readers=DEFAULT_READERS,
+    queue_depth=DEFAULT_QUEUE_DEPTH,
+):
+    """
+    Yield each transcript's results in order. Upcoming files are read and
+    tokenized in threads while the model runs on the current one.
+    """
+    model_pipeline = load_pipeline("misogyny", backend)
+    cache = open_cache(use_cache)
+    run = StagedRun()
+    try:
+        for results in classify_staged(
+            filepaths,
+            functools.partial(parse_vtt_file, segment=segment),
+            model_pipeline,
+            batch_size,
+            cache=cache,
+            triage=load_triage("misogyny") if triage else None,
+            readers=readers,
+            depth=queue_depth,
+            run=run,
+        ):
+            yield [(result[0]["score"], result[0]["label"]) for result in results]
+    finally:
+        print(f"Pipeline stages:\n{run.report()}")
+        if triage:
+            print(load_triage("misogyny").stats())
+        if cache:
+            print(cache.stats())
+            cache.close()
+
+
+def classify_files_in_workers(
+    filepaths,
+    batch_size=DEFAULT_BATCH_SIZE,
+    use_cache=True,
+    workers=2,
+    threads_per_worker=1,
+    backend="torch",
+    segment="caption",
+    triage=False,
+):
+    """Yield each transcript's results in order, classified by worker processes."""
+    # Workers count the sentences they skip; the totals are kept here.
+    triage_model = load_triage("misogyny") if triage else None
+    try:
+        for results, skipped, total in imap_workers(
+            functools.partial(
+                classify_vtt_file,
+                batch_size=batch_size,
+                segment=segment,
+                triage=triage,
+            ),
+            filepaths,
+            functools.partial(load_pipeline, "misogyny", backend),
+            workers,
+            threads_per_worker,
+            use_cache,
+        ):
+            if triage_model:
+                triage_model.skipped += skipped
+                triage_model.total += total
+            yield results
+    finally:
+        if triage_model:
+            print(triage_model.stats())
+
+
+def write_classification_to_csv(
+    shows,
+    output_csv,
+    batch_size=DEFAULT_BATCH_SIZE,
+    use_cache=True,
+    workers=1,
+    threads_per_worker=1,
+    backend="torch",
+    segment="caption",
+    resume=True,
+    output_format="csv",
+    triage=False,
+    readers=DEFAULT_READERS,
+    queue_depth=DEFAULT_QUEUE_DEPTH,
+):
+    """
+    Classify transcripts not yet in the run's checkpoint, then write the
+    scores as CSV or Parquet along with a per-episode summary.
+
+    Each transcript's rows are checkpointed beside the output as soon as it
+    finishes, so an interrupted run resumes where it stopped and later runs
+    only classify new or changed episodes.
+    """
+    vtt_files = list_show_files(shows)
+    options = {"model": "misogyny", "backend": backend, "segment": segment}
+    if triage:
+        # Loaded here so forked workers inherit it.
+        options["triage_threshold"] = load_triage("misogyny").threshold
+    checkpoint = Checkpoint(default_run_dir(output_csv), options, resume)
+    pending = [
+        (show_name, fp) for show_name, fp in vtt_files if not checkpoint.is_done(fp)
+    ]
+    if len(pending) < len(vtt_files):
+        print(
+            f"Resuming: {len(vtt_files) - len(pending)} of {len(vtt_files)} "
+            "transcripts already classified"
+        )
+    filepaths = [fp for _, fp in pending]
+
+    if not filepaths:
+        results = []
+    elif workers > 1:
+        results = classify_files_in_workers(
+            filepaths,
+            batch_size,
+            use_cache,
+            workers,
+            threads_per_worker,
+            backend,
+            segment,
+            triage,
+        )
+    else:
+        results = classify_files(
+            filepaths,
+            batch_size,
+            use_cache,
+            backend,
+            segment,
+            triage,
+            readers,
+            queue_depth,
+        )
+
+    with checkpoint:
+        with alive_bar(len(pending), title="Classifying") as bar:
+            # Results come first so the generator runs to completion and
+            # reports cache or worker memory stats.
+            for file_results, (show_name, fn) in zip(results, pending):
+                checkpoint.record(
+                    fn, ((fn, lbl, sc, show_name) for sc, lbl in file_results)
+                )
+                bar()
+        write_scores(checkpoint, [fp for _, fp in vtt_files], output_csv, output_format)
+
+    print(f"Saved scores to {output_csv} and {summary_path(output_csv)}")
 
-    df = pd.DataFrame(all_data)
-    df.to_csv(output_csv, index=False)
-    print(f"Saved CSV to {output_csv}")
 
+def estimate_show_counts(
+    shows,
+    ci_width=DEFAULT_CI_WIDTH,
+    confidence=DEFAULT_CONFIDENCE,
+    seed=None,
+    batch_size=DEFAULT_BATCH_SIZE,
+    use_cache=True,
+    backend="torch",
+    segment="caption",
+):
+    """
+    Estimate each show's share of misogyny from a sample stratified by episode.
 
-def generate_faceted_pie_chart(df, output_html, title):
-    summary = (
-        df.groupby("show")["label"].value_counts().unstack(fill_value=0).reset_index()
+    Returns a label count table scaled from the estimates, for
+    generate_faceted_pie_chart, and a footer note per show.
+    """
+    model_pipeline = load_pipeline("misogyny", backend)
+    cache = open_cache(use_cache)
+
+    def is_misogynist(texts):
+        results = classify_batched(texts, model_pipeline, batch_size, cache=cache)
+        return [result[0]["label"] == "misogynist" for result in results]
+
+    estimates = {}
+    try:
+        for show_path in shows:
+            show_name = os.path.basename(os.path.dirname(show_path))
+            sentences = []
+            episodes = []
+            for filepath in list_transcripts(show_path):
+                texts = parse_vtt_file(filepath, segment)
+                sentences.extend(texts)
+                episodes.extend([filepath] * len(texts))
+            print(f"Estimating {show_name}")
+            estimates[show_name] = estimate_proportion(
+                sentences, episodes, is_misogynist, ci_width, confidence, seed
+            )
+    finally:
+        if cache:
+            print(cache.stats())
+            cache.close()
+
+    names = sorted(estimates)
+    label_counts = pd.DataFrame(
+        {
+            "show": names,
+            "misogynist": [
+                estimates[n].proportion * estimates[n].population for n in names
+            ],
+            "non-misogynist": [
+                (1 - estimates[n].proportion) * estimates[n].population for n in names
+            ],
+        }
     )
-    summary.columns.name = None
-    summary = summary.rename(
+    notes = [f"{n}: {describe_estimate(estimates[n])}" for n in names]
+    return label_counts, notes
+
+
+def generate_faceted_pie_chart(label_counts, output_html, title, notes=()):
+    summary = label_counts.rename(
         columns={
             "misogynist": "Misogyny",
             "non-misogynist": "Non Misogyny",
@@ -121,7 +347,7 @@ def generate_faceted_pie_chart(df, output_html, title):
                 y=-0.1,
                 xref="paper",
                 yref="paper",
-                text=f"Generated: {timestamp}",
+                text=f"Generated: {timestamp}" + "".join(f"<br />{n}" for n in notes),
                 showarrow=False,
                 font=dict(size=12, color="gray"),
             ),
@@ -145,26 +371,195 @@ def cli():
     type=click.Path(exists=True),
     help="Paths to VTT folders",
 )
+@click.option(
+    "--batch-size",
+    default=DEFAULT_BATCH_SIZE,
+    show_default=True,
+    help="Sentences per model forward pass",
+)
+@click.option(
+    "--cache/--no-cache",
+    default=True,
+    show_default=True,
+    help="Reuse scores from the shared classification cache",
+)
+@click.option(
+    "--workers",
+    default=1,
+    show_default=True,
+    help="Worker processes to shard VTT files across",
+)
+@click.option(
+    "--threads-per-worker",
+    default=1,
+    show_default=True,
+    help="Torch threads, and pinned cores, for each worker",
+)
+@click.option(
+    "--backend",
+    type=click.Choice(BACKENDS),
+    default="torch",
+    show_default=True,
+    help="CPU inference backend",
+)
+@click.option(
+    "--segment",
+    type=click.Choice(SEGMENT_MODES),
+    default="caption",
+    show_default=True,
+    help="Classify captions as-is, or merged into sentences",
+)
+@click.option(
+    "--resume/--no-resume",
+    default=True,
+    show_default=True,
+    help="Continue from the checkpoint beside OUTPUT_CSV",
+)
+@click.option(
+    "--format",
+    "output_format",
+    type=click.Choice(SCORE_FORMATS),
+    default="csv",
+    show_default=True,
+    help="Score table format; parquet stores categorical columns and float32 scores",
+)
+@click.option(
+    "--triage",
+    is_flag=True,
+    help="Skip the model for sentences the calibrated lexical pre-filter clears",
+)
+@click.option(
+    "--readers",
+    default=DEFAULT_READERS,
+    show_default=True,
+    help="Threads reading upcoming transcripts while the model runs",
+)
+@click.option(
+    "--queue-depth",
+    default=DEFAULT_QUEUE_DEPTH,
+    show_default=True,
+    help="Transcripts read and tokenized ahead of the model",
+)
 @click.argument("output_csv", type=click.Path())
-def csv_command(shows, output_csv):
+def csv_command(
+    shows,
+    batch_size,
+    cache,
+    workers,
+    threads_per_worker,
+    backend,
+    segment,
+    resume,
+    output_format,
+    triage,
+    readers,
+    queue_depth,
+    output_csv,
+):
     """Process VTT directories and output classification to CSV"""
-    write_classification_to_csv(shows, output_csv)
+    write_classification_to_csv(
+        shows,
+        output_csv,
+        batch_size,
+        cache,
+        workers,
+        threads_per_worker,
+        backend,
+        segment,
+        resume,
+        output_format,
+        triage,
+        readers,
+        queue_depth,
+    )
 
 
 @cli.command(name="graph")
 @click.option("--title", "-t", default="Misogyny Classification", help="Chart title")
 @click.option(
     "--csv",
+    "--scores",
     "csv_file",
-    required=True,
     type=click.Path(exists=True),
-    help="CSV file with classification data",
+    help="CSV or Parquet file with classification data",
+)
+@click.option(
+    "--estimate",
+    is_flag=True,
+    help="Classify a stratified sample of the --shows transcripts instead",
+)
+@click.option(
+    "--shows",
+    multiple=True,
+    type=click.Path(exists=True),
+    help="Paths to VTT folders, with --estimate",
+)
+@click.option(
+    "--ci-width",
+    default=DEFAULT_CI_WIDTH,
+    show_default=True,
+    help="With --estimate, sample until each confidence interval is this narrow",
+)
+@click.option(
+    "--confidence",
+    default=DEFAULT_CONFIDENCE,
+    show_default=True,
+    help="Confidence level of the --estimate intervals",
+)
+@click.option("--seed", type=int, help="Random seed for --estimate sampling")
+@click.option(
+    "--batch-size",
+    default=DEFAULT_BATCH_SIZE,
+    show_default=True,
+    help="Sentences per model forward pass",
+)
+@click.option(
+    "--cache/--no-cache",
+    default=True,
+    show_default=True,
+    help="Reuse scores from the shared classification cache",
+)
+@click.option(
+    "--backend",
+    type=click.Choice(BACKENDS),
+    default="torch",
+    show_default=True,
+    help="CPU inference backend",
+)
+@click.option(
+    "--segment",
+    type=click.Choice(SEGMENT_MODES),
+    default="caption",
+    show_default=True,
+    help="Classify captions as-is, or merged into sentences",
 )
 @click.argument("output_html_file", type=click.Path())
-def graph_command(title, csv_file, output_html_file):
-    """Generate a faceted pie chart from CSV"""
-    df = pd.read_csv(csv_file)
-    generate_faceted_pie_chart(df, output_html_file, title)
+def graph_command(
+    title,
+    csv_file,
+    estimate,
+    shows,
+    ci_width,
+    confidence,
+    seed,
+    batch_size,
+    cache,
+    backend,
+    segment,
+    output_html_file,
+):
+    """Generate a faceted pie chart from CSV, or from sampled estimates"""
+    if estimate:
+        if not shows:
+            raise click.UsageError("--estimate needs at least one --shows path.")
+        label_counts, notes = estimate_show_counts(
+            shows, ci_width, confidence, seed, batch_size, cache, backend, segment
+        )
+    elif csv_file:
+        label_counts, notes = show_label_counts(csv_file), ()
+    else:
+        raise click.UsageError("Pass --csv, or --estimate with --shows.")
+    generate_faceted_pie_chart(label_counts, output_html_file, title, notes)
 
 
 if __name__ == "__main__":
@@ -1,11 +1,20 @@
-import time
-from collections import defaultdict
-
 import click
 import gspread
 from alive_progress import alive_bar
+from gspread.utils import rowcol_to_a1
 from oauth2client.service_account import ServiceAccountCredentials
-from transformers import pipeline
+
+from manowhisper.inference import DEFAULT_BATCH_SIZE
+from manowhisper.models import EMOTION_LABELS, load_pipeline
+from manowhisper.windows import (
+    DEFAULT_MAX_TOKENS,
+    DEFAULT_STRIDE,
+    aggregate_windows,
+    token_windows,
+)
+
+SUMMARY_COLUMN = 3
+DEFAULT_WRITE_EVERY = 100
 
 
 def setup_google_sheets(sheet_id, keyfile_path):
@@ -20,96 +29,183 @@ def setup_google_sheets(sheet_id, keyfile_path):
     return sheet
 
 
-def classify_emotion(summary, model_pipeline, max_length=512):
+def classify_emotion(
+    summary,
+    model_pipeline,
+    max_tokens=DEFAULT_MAX_TOKENS,
+    stride=DEFAULT_STRIDE,
+    length_weighted=True,
+    batch_size=DEFAULT_BATCH_SIZE,
+):
     """
     Classify the emotion of the given summary using the provided model.
+
+    The summary is split into overlapping token windows that are classified
+    in one batched call, and scores are averaged across windows.
     """
-    # Split summary into chunks of max_length.
-    chunks = [summary[i : i + max_length] for i in range(0, len(summary), max_length)]
+    windows = token_windows(
+        summary, getattr(model_pipeline, "tokenizer", None), max_tokens, stride
+    )
+    if not windows:
+        return {}
 
-    aggregated_scores = defaultdict(float)
+    texts = [text for text, _ in windows]
+    results = model_pipeline(texts, batch_size=batch_size, truncation=True)
+    if not all(
+        isinstance(result, dict)
+        or (isinstance(result, list) and result and isinstance(result[0], dict))
+        for result in results
+    ):
+        print("Unexpected output structure from the model.")
+        return {}
 
-    for chunk in chunks:
-        results = model_pipeline(chunk)
+    lengths = [length for _, length in windows] if length_weighted else None
+    return aggregate_windows(results, lengths)
 
-        # Aggregate scores across chunks.
-        if isinstance(results, list) and isinstance(results[0], dict):
-            for entry in results:
-                aggregated_scores[entry["label"]] += entry["score"]
-        else:
-            print("Unexpected output structure from the model.")
-            return {}
 
-    # Average the scores over the number of chunks.
-    num_chunks = len(chunks)
-    return {label: score / num_chunks for label, score in aggregated_scores.items()}
+def emotion_columns(sheet, headers, emotion_labels):
+    """
+    1-based column of each emotion label, adding headers for any that are
+    missing after the last used column.
+    """
+    columns = {
+        label: headers.index(label) + 1 for label in emotion_labels if label in headers
+    }
+    missing = [label for label in emotion_labels if label not in columns]
+    if missing:
+        first_empty_col = len(headers) + 1
+        sheet.update(
+            range_name=rowcol_to_a1(1, first_empty_col),
+            values=[missing],
+        )
+        for i, label in enumerate(missing):
+            columns[label] = first_empty_col + i
+    return columns
 
 
-def process_sheets(sheet_id, keyfile_path):
-    """Add emotion scores to Google Sheet."""
-    sheet = setup_google_sheets(sheet_id, keyfile_path)
+def pending_rows(rows, columns, summary_col=SUMMARY_COLUMN, rescore=False):
+    """(row number, summary) for rows with a summary and a blank emotion cell."""
+    pending = []
+    for number, row in enumerate(rows[1:], start=2):
+        summary = row[summary_col - 1] if len(row) >= summary_col else ""
+        if not summary.strip():
+            continue
+        cells = [row[col - 1] if len(row) >= col else "" for col in columns.values()]
+        if rescore or any(cell == "" for cell in cells):
+            pending.append((number, summary))
+    return pending
 
-    # Load the "Summary" column; assume it's column 3.
-    summaries = sheet.col_values(3)
 
-    # Initialize the model pipeline.
-    model_pipeline = pipeline(
-        "text-classification", model="j-hartmann/emotion-english-distilroberta-base"
-    )
+def top_label_rows(rows, columns):
+    """
+    Rows scored by earlier versions, which kept only the top emotion's score:
+    every emotion cell filled and exactly one of them non-zero.
+    """
+    old_rows = []
+    for number, row in enumerate(rows[1:], start=2):
+        cells = [row[col - 1] if len(row) >= col else "" for col in columns.values()]
+        try:
+            scores = [float(cell) for cell in cells]
+        except ValueError:
+            continue
+        if sum(score != 0 for score in scores) == 1:
+            old_rows.append(number)
+    return old_rows
 
-    # Define emotion labels.
-    emotion_labels = [
-        "anger",
-        "disgust",
-        "fear",
-        "joy",
-        "neutral",
-        "sadness",
-        "surprise",
-    ]
 
-    # Get the headers.
-    headers = sheet.row_values(1)
+def score_ranges(scores, columns):
+    """
+    Batch update ranges for {row number: {label: score}}, one per block of
+    consecutive rows and consecutive emotion columns.
+    """
+    ordered = sorted(columns.items(), key=lambda item: item[1])
+    column_runs = []
+    for label, col in ordered:
+        if column_runs and col == column_runs[-1][-1][1] + 1:
+            column_runs[-1].append((label, col))
+        else:
+            column_runs.append([(label, col)])
 
-    # Find the first empty column.
-    first_empty_col = len(headers) + 1
+    row_runs = []
+    for number in sorted(scores):
+        if row_runs and number == row_runs[-1][-1] + 1:
+            row_runs[-1].append(number)
+        else:
+            row_runs.append([number])
 
-    # Add headers for emotion labels starting from the first empty column.
-    for i, label in enumerate(emotion_labels):
-        col_index = first_empty_col + i
-        col_letter = chr(64 + col_index)
-        sheet.update(range_name=f"{col_letter}1", values=[[label]])
+    ranges = []
+    for numbers in row_runs:
+        for run in column_runs:
+            first = rowcol_to_a1(numbers[0], run[0][1])
+            last = rowcol_to_a1(numbers[-1], run[-1][1])
+            ranges.append(
+                {
+                    "range": f"{first}:{last}",
+                    "values": [
+                        [round(scores[n].get(label, 0), 4) for label, _ in run]
+                        for n in numbers
+                    ],
+                }
+            )
+    return ranges
 
-    # Map emotion labels to column indices (starting from the first empty column).
-    label_indices = {
-        label: first_empty_col + i for i, label in enumerate(emotion_labels)
-    }
 
-    # Clear any existing emotion data in the columns (from second row onwards).
-    range_to_clear = f"{chr(64 + first_empty_col)}2:{chr(64 + first_empty_col + len(emotion_labels) - 1)}"
-    sheet.batch_clear([range_to_clear])
+def process_sheets(
+    sheet_id,
+    keyfile_path,
+    max_tokens=DEFAULT_MAX_TOKENS,
+    stride=DEFAULT_STRIDE,
+    length_weighted=True,
+    batch_size=DEFAULT_BATCH_SIZE,
+    rescore=False,
+    write_every=DEFAULT_WRITE_EVERY,
+):
+    """
+    Add emotion scores to Google Sheet.
+
+    Only rows with a summary and a blank emotion cell are scored, and their
+    scores are written back in batched range updates every write_every rows.
+    """
+    sheet = setup_google_sheets(sheet_id, keyfile_path)
+
+    # One read of the whole sheet; summaries are in column 3.
+    rows = sheet.get_all_values()
+    headers = rows[0] if rows else []
+    emotion_labels = EMOTION_LABELS
+    columns = emotion_columns(sheet, headers, emotion_labels)
 
-    # Loop through the summaries and classify each one.
-    with alive_bar(len(summaries) - 1, title="Processing Summaries") as bar:
-        for i, summary in enumerate(summaries[1:], start=2):
+    old_rows = [] if rescore else top_label_rows(rows, columns)
+    if old_rows:
+        print(
+            f"Warning: {len(old_rows)} rows only hold the top emotion's score, from "
+            "before scores became full distributions over every emotion. New rows "
+            "will not be comparable with them; rerun with --rescore."
+        )
 
-            # Get the emotion scores.
-            emotion_scores = classify_emotion(summary, model_pipeline)
+    pending = pending_rows(rows, columns, rescore=rescore)
+    print(f"Scoring {len(pending)} of {max(len(rows) - 1, 0)} rows")
+    if not pending:
+        return
 
-            # Prepare a row with the current data.
-            row_update = []
-            for label in emotion_labels:
-                # Check if the label exists in emotion_scores, if not, use 0 as a default.
-                emotion_score = emotion_scores.get(label, 0)
-                row_update.append(round(emotion_score, 4))
+    # Scores for every emotion, so window averages are full distributions.
+    model_pipeline = load_pipeline("emotion")
 
-            # Update the row with the emotion scores.
-            range_to_update = f"{chr(64 + first_empty_col)}{i}:{chr(64 + first_empty_col + len(emotion_labels) - 1)}{i}"
-            sheet.update(range_to_update, [row_update])
+    scores = {}
 
-            # Add delay to avoid abusing the API.
-            time.sleep(2)
+    def flush():
+        if scores:
+            sheet.batch_update(score_ranges(scores, columns))
+            scores.clear()
+
+    with alive_bar(len(pending), title="Processing Summaries") as bar:
+        for number, summary in pending:
+            scores[number] = classify_emotion(
+                summary, model_pipeline, max_tokens, stride, length_weighted, batch_size
+            )
+            if len(scores) >= write_every:
+                flush()
             bar()
+        flush()
 
 
 @click.command()
@@ -121,7 +217,51 @@ def process_sheets(sheet_id, keyfile_path):
     show_default=True,
     help="Path to the JSON key file for Google Sheets API authentication.",
 )
-def main(google_sheet_id, keyfile_path):
+@click.option(
+    "--max-tokens",
+    default=DEFAULT_MAX_TOKENS,
+    show_default=True,
+    help="Tokens per window, capped at the model's input limit",
+)
+@click.option(
+    "--stride",
+    default=DEFAULT_STRIDE,
+    show_default=True,
+    help="Tokens shared by consecutive windows",
+)
+@click.option(
+    "--length-weighted/--no-length-weighted",
+    default=True,
+    show_default=True,
+    help="Weight each window's scores by its token count",
+)
+@click.option(
+    "--batch-size",
+    default=DEFAULT_BATCH_SIZE,
+    show_default=True,
+    help="Windows per model forward pass",
+)
+@click.option(
+    "--rescore",
+    is_flag=True,
+    help="Score every row again, not only rows with blank emotion cells",
+)
+@click.option(
+    "--write-every",
+    default=DEFAULT_WRITE_EVERY,
+    show_default=True,
+    help="Rows scored between batched writes to the sheet",
+)
+def main(
+    google_sheet_id,
+    keyfile_path,
+    max_tokens,
+    stride,
+    length_weighted,
+    batch_size,
+    rescore,
+    write_every,
+):
     """
     Generate emotion scores from podcast summaries in a Google Sheet.
 
@@ -129,7 +269,16 @@ def main(google_sheet_id, keyfile_path):
     Arguments:
       GOOGLE_SHEET_ID   The ID of the Google Sheet.
     """
-    process_sheets(google_sheet_id, keyfile_path)
+    process_sheets(
+        google_sheet_id,
+        keyfile_path,
+        max_tokens,
+        stride,
+        length_weighted,
+        batch_size,
+        rescore,
+        write_every,
+    )
 
 
 if __name__ == "__main__":
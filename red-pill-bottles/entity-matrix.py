@@ -4,12 +4,12 @@ import time
 
 import click
 import gspread
-import spacy
-import webvtt
 from alive_progress import alive_bar
 from google.oauth2.service_account import Credentials
 from gspread.exceptions import APIError
 
+from manowhisper.vtt import read_text
+
 
 def setup_google_sheets(json_keyfile):
     """Setup function to connect to Google Sheets."""
@@ -24,7 +24,7 @@ def setup_google_sheets(json_keyfile):
 
 def extract_text_from_vtt(vtt_path):
     """Extract and preprocess text from transcripts."""
-    return " ".join(caption.text for caption in webvtt.read(vtt_path))
+    return read_text(vtt_path)
 
 
 def retry_on_quota_error(func, *args, max_retries=5, base_delay=2, **kwargs):
@@ -53,7 +53,9 @@ def process_vtt_files(vtt_directory, json_keyfile, spreadsheet_id):
     Extract "PERSON", "NORP", "FAC", "ORG", and "PRODUCT" from transcripts.
     """
 
-    # Load spaCy model.
+    # Load spaCy model, importing it here so --help stays fast.
+    import spacy
+
     nlp = spacy.load("en_core_web_sm")
 
     # Set up Google Sheets.
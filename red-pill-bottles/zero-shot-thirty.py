@@ -2,55 +2,212 @@ import os
 
 import click
 import pandas as pd
-import webvtt
 from alive_progress import alive_bar
-from transformers import pipeline
 
-# Initialize the zero-shot classification pipeline.
-zero_shot_classifier = pipeline(
-    "zero-shot-classification", model="facebook/bart-large-mnli"
+from manowhisper.backends import BACKENDS, build_pipeline
+from manowhisper.cache import open_cache
+from manowhisper.corpus import list_transcripts, read_transcript_text
+from manowhisper.embeddings import (
+    DEFAULT_EMBEDDING_CHUNK_TOKENS,
+    DEFAULT_EMBEDDING_MODEL,
+    SentenceEncoder,
+    chunk_embeddings,
+    embedding_store,
+    similarity_scores,
 )
+from manowhisper.inference import DEFAULT_BATCH_SIZE
+from manowhisper.zeroshot import (
+    DEFAULT_CHUNK_TOKENS,
+    DEFAULT_HYPOTHESIS_TEMPLATE,
+    DEFAULT_MARGIN,
+    DEFAULT_SMALL_MODEL,
+    ZERO_SHOT_MODEL,
+    Cascade,
+    classify_transcript,
+)
+
+METHODS = ["nli", "embedding"]
 
 
 def extract_text_from_vtt(vtt_path):
     """Extract and preprocess text from transcripts."""
-    transcript = []
-    for caption in webvtt.read(vtt_path):
-        transcript.append(caption.text)
-    return " ".join(transcript)
+    return read_transcript_text(vtt_path)
+
 
+def classify_text(text, candidate_labels, zero_shot_classifier, **kwargs):
+    """
+    Classify podcast transcript text.
 
-def classify_text(text, candidate_labels):
-    """Classify podcast transcript text."""
-    zero_shot_result = zero_shot_classifier(text, candidate_labels)
-    return zero_shot_result["labels"][0]  # Highest score label
+    Returns every label's score, averaged over chunks of the whole transcript.
+    """
+    return classify_transcript(text, candidate_labels, zero_shot_classifier, **kwargs)
 
 
-def process_vtt_directory(vtt_directory, candidate_labels):
-    """Process a directory of transcripts."""
+def process_vtt_directory(vtt_directory, candidate_labels, classify_file):
+    """
+    Process a directory of transcripts. classify_file takes a transcript
+    path and returns {label: score}.
+    """
     results = []
-    files = [f for f in os.listdir(vtt_directory) if f.endswith(".vtt")]
+    files = list_transcripts(vtt_directory)
 
     with alive_bar(len(files), title="Processing WebVTT Files") as bar:
-        for filename in files:
-            file_path = os.path.join(vtt_directory, filename)
+        for file_path in files:
+            filename = os.path.basename(file_path)
             try:
-                text = extract_text_from_vtt(file_path)
-                zero_shot_class = classify_text(text, candidate_labels)
-                results.append([filename, zero_shot_class])
+                scores = classify_file(file_path)
+                zero_shot_class = max(scores, key=scores.get) if scores else None
+                results.append(
+                    [filename, zero_shot_class]
+                    + [round(scores.get(label, 0), 4) for label in candidate_labels]
+                )
             except Exception as e:
                 print(f"Error processing {filename}: {e}")
             bar()
 
     # Return the results as a pandas DataFrame.
-    return pd.DataFrame(results, columns=["filename", "zero_shot_classification"])
+    return pd.DataFrame(
+        results, columns=["filename", "zero_shot_classification"] + candidate_labels
+    )
+
+
+def nli_classifier(
+    candidate_labels,
+    backend="torch",
+    hypothesis_template=DEFAULT_HYPOTHESIS_TEMPLATE,
+    chunk_tokens=DEFAULT_CHUNK_TOKENS,
+    stride=0,
+    batch_size=DEFAULT_BATCH_SIZE,
+    cache=None,
+    multi_label=False,
+    cascade_margin=None,
+    small_model=DEFAULT_SMALL_MODEL,
+):
+    """
+    Score transcripts with an NLI model over every chunk and label.
+
+    With cascade_margin, the small model scores every chunk and returns the
+    Cascade whose large model rescores uncertain ones; otherwise None.
+    """
+    # Initialize the zero-shot classification pipeline.
+    zero_shot_classifier = build_pipeline(
+        "zero-shot-classification", ZERO_SHOT_MODEL, backend
+    )
+    cascade = None
+    if cascade_margin is not None:
+        cascade = Cascade(zero_shot_classifier, cascade_margin)
+        zero_shot_classifier = build_pipeline(
+            "zero-shot-classification", small_model, backend
+        )
 
+    def classify_file(file_path):
+        return classify_text(
+            extract_text_from_vtt(file_path),
+            candidate_labels,
+            zero_shot_classifier,
+            hypothesis_template=hypothesis_template,
+            chunk_tokens=chunk_tokens,
+            stride=stride,
+            batch_size=batch_size,
+            cache=cache,
+            multi_label=multi_label,
+            cascade=cascade,
+        )
 
-def generate_spreadsheet(vtt_directory, output_file, candidate_labels):
+    return classify_file, cascade
+
+
+def embedding_classifier(
+    candidate_labels,
+    embedding_model=DEFAULT_EMBEDDING_MODEL,
+    hypothesis_template=DEFAULT_HYPOTHESIS_TEMPLATE,
+    chunk_tokens=DEFAULT_EMBEDDING_CHUNK_TOKENS,
+    stride=0,
+    batch_size=DEFAULT_BATCH_SIZE,
+    rescore=False,
+):
+    """
+    Score transcripts by the similarity of stored chunk embeddings to the
+    label descriptions.
+    """
+    encoder = SentenceEncoder(embedding_model)
+    store = embedding_store(encoder, chunk_tokens, stride)
+    label_vectors = encoder.encode(
+        [hypothesis_template.format(label) for label in candidate_labels]
+    )
+
+    def classify_file(file_path):
+        lengths, vectors = chunk_embeddings(
+            file_path,
+            extract_text_from_vtt,
+            encoder,
+            store,
+            chunk_tokens,
+            stride,
+            batch_size,
+            rescore,
+        )
+        if not len(vectors):
+            return {}
+        scores = similarity_scores(vectors, lengths, label_vectors)
+        return dict(zip(candidate_labels, scores.tolist()))
+
+    return classify_file
+
+
+def generate_spreadsheet(
+    vtt_directory,
+    output_file,
+    candidate_labels,
+    backend="torch",
+    hypothesis_template=DEFAULT_HYPOTHESIS_TEMPLATE,
+    chunk_tokens=None,
+    stride=0,
+    batch_size=DEFAULT_BATCH_SIZE,
+    use_cache=True,
+    multi_label=False,
+    method="nli",
+    embedding_model=DEFAULT_EMBEDDING_MODEL,
+    rescore=False,
+    cascade_margin=None,
+    small_model=DEFAULT_SMALL_MODEL,
+):
     """Create the output spreadsheet."""
-    result_df = process_vtt_directory(vtt_directory, candidate_labels)
+    cache = None
+    cascade = None
+    if method == "embedding":
+        classify_file = embedding_classifier(
+            candidate_labels,
+            embedding_model,
+            hypothesis_template,
+            chunk_tokens or DEFAULT_EMBEDDING_CHUNK_TOKENS,
+            stride,
+            batch_size,
+            rescore,
+        )
+    else:
+        cache = open_cache(use_cache)
+        classify_file, cascade = nli_classifier(
+            candidate_labels,
+            backend,
+            hypothesis_template,
+            chunk_tokens or DEFAULT_CHUNK_TOKENS,
+            stride,
+            batch_size,
+            cache,
+            multi_label,
+            cascade_margin,
+            small_model,
+        )
+
+    result_df = process_vtt_directory(vtt_directory, candidate_labels, classify_file)
     result_df.to_csv(output_file, index=False)
     print(f"Classification results saved to {output_file}")
+    if cascade:
+        print(cascade.stats())
+    if cache:
+        print(cache.stats())
+        cache.close()
 
 
 @click.command()
@@ -62,10 +219,110 @@ def generate_spreadsheet(vtt_directory, output_file, candidate_labels):
     required=True,
     help="Comma-separated list of candidate labels for classification, e.g., 'label 1,label 2,label 3'.",
 )
-def main(vtt_directory, output_file, candidate_labels):
+@click.option(
+    "--backend",
+    type=click.Choice(BACKENDS),
+    default="torch",
+    show_default=True,
+    help="CPU inference backend.",
+)
+@click.option(
+    "--hypothesis-template",
+    default=DEFAULT_HYPOTHESIS_TEMPLATE,
+    show_default=True,
+    help="NLI hypothesis, with {} where the label goes.",
+)
+@click.option(
+    "--chunk-tokens",
+    type=int,
+    help=(
+        f"Transcript tokens per chunk.  [default: {DEFAULT_CHUNK_TOKENS} for nli, "
+        f"{DEFAULT_EMBEDDING_CHUNK_TOKENS} for embedding]"
+    ),
+)
+@click.option(
+    "--stride",
+    default=0,
+    show_default=True,
+    help="Tokens shared by consecutive chunks.",
+)
+@click.option(
+    "--batch-size",
+    default=DEFAULT_BATCH_SIZE,
+    show_default=True,
+    help="Chunk and label pairs per model forward pass.",
+)
+@click.option(
+    "--cache/--no-cache",
+    default=True,
+    show_default=True,
+    help="Reuse chunk and label scores from the shared classification cache.",
+)
+@click.option(
+    "--multi-label",
+    is_flag=True,
+    help="Score each label independently instead of against each other.",
+)
+@click.option(
+    "--method",
+    type=click.Choice(METHODS),
+    default="nli",
+    show_default=True,
+    help="Score labels with the NLI model, or by similarity to chunk embeddings.",
+)
+@click.option(
+    "--embedding-model",
+    default=DEFAULT_EMBEDDING_MODEL,
+    show_default=True,
+    help="Sentence-embedding model for --method embedding.",
+)
+@click.option(
+    "--rescore",
+    is_flag=True,
+    help="Encode chunks again instead of reading stored embeddings.",
+)
+@click.option(
+    "--cascade",
+    is_flag=True,
+    help="Score chunks with a small NLI model first and only escalate uncertain ones.",
+)
+@click.option(
+    "--small-model",
+    default=DEFAULT_SMALL_MODEL,
+    show_default=True,
+    help="Distilled NLI model for --cascade.",
+)
+@click.option(
+    "--margin",
+    default=DEFAULT_MARGIN,
+    show_default=True,
+    help="Escalate chunks whose top two small-model label scores are this close.",
+)
+def main(
+    vtt_directory,
+    output_file,
+    candidate_labels,
+    backend,
+    hypothesis_template,
+    chunk_tokens,
+    stride,
+    batch_size,
+    cache,
+    multi_label,
+    method,
+    embedding_model,
+    rescore,
+    cascade,
+    small_model,
+    margin,
+):
     """
     Process a directory of WebVTT files and do zero-shot classification content with facebook/bart-large-mnli.
 
+    Each transcript is split into chunks that are all classified, and label
+    scores are averaged over the chunks. With --method embedding, chunks are
+    encoded once and labels are scored by cosine similarity instead.
+
     \b
     Arguments:
       VTT_DIRECTORY   Path to the directory containing WebVTT files.
@@ -74,10 +331,30 @@ def main(vtt_directory, output_file, candidate_labels):
     \b
     Options:
       --candidate-labels   Comma-separated list of candidate labels for classification.
+      --backend            CPU inference backend (torch, torch-int8, onnx).
+      --method             nli (facebook/bart-large-mnli) or embedding.
     """
+    if cascade and method == "embedding":
+        raise click.UsageError("--cascade only applies to --method nli.")
     # Split and clean candidate labels.
     candidate_labels_list = [label.strip() for label in candidate_labels.split(",")]
-    generate_spreadsheet(vtt_directory, output_file, candidate_labels_list)
+    generate_spreadsheet(
+        vtt_directory,
+        output_file,
+        candidate_labels_list,
+        backend,
+        hypothesis_template,
+        chunk_tokens,
+        stride,
+        batch_size,
+        cache,
+        multi_label,
+        method,
+        embedding_model,
+        rescore,
+        margin if cascade else None,
+        small_model,
+    )
 
 
 if __name__ == "__main__":
@@ -3,14 +3,26 @@ import os
 from collections import Counter
 
 import nltk
-import webvtt
 from nltk.tokenize import sent_tokenize
 from tqdm import tqdm
-from transformers import AutoTokenizer
 
-nltk.download("punkt")
+from manowhisper.vtt import read_text
 
-tokenizer = AutoTokenizer.from_pretrained("facebook/bart-large-cnn")
+# Loaded on first use by load_tokenizer(), so --help stays fast.
+tokenizer = None
+
+
+# Load the tokenizer and fetch the sentence splitter only if it is missing.
+def load_tokenizer():
+    global tokenizer
+    if tokenizer is None:
+        from transformers import AutoTokenizer
+
+        try:
+            nltk.data.find("tokenizers/punkt")
+        except LookupError:
+            nltk.download("punkt")
+        tokenizer = AutoTokenizer.from_pretrained("facebook/bart-large-cnn")
 
 
 # Extract metrics from a transcript.
@@ -37,11 +49,8 @@ def extract_metrics(transcript):
 
 # Extract text from a transcript file.
 def extract_text_from_vtt(vtt_file_path):
-    transcript = []
     try:
-        for caption in webvtt.read(vtt_file_path):
-            transcript.append(caption.text)
-        return " ".join(transcript)
+        return read_text(vtt_file_path)
     except Exception as e:
         print(f"Error reading {vtt_file_path}: {e}")
         return ""
@@ -49,6 +58,7 @@ def extract_text_from_vtt(vtt_file_path):
 
 # Process transcript files.
 def process_vtt_files(vtt_directory, output_csv_path):
+    load_tokenizer()
     with open(output_csv_path, mode="w", newline="") as csv_file:
         csv_writer = csv.writer(csv_file)
         csv_writer.writerow(
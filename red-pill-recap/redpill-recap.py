@@ -1,6 +1,17 @@
 """
 Generates summaries from a directory of WebVTT files..
 
+By default each transcript is summarized map-reduce style: the whole
+transcript is cut into chunks that fit the model, the chunks are summarized
+in batches with beam search, and the joined chunk summaries are summarized
+again (in more rounds if they are still too long). Chunk summaries are kept
+in the shared score cache by content hash, so reruns and repeated segments
+skip the model. --mode truncate keeps the old single pass over the first
+1,024 tokens.
+
+With --extractive-budget, only the transcript's most salient sentences (by
+TF-IDF centrality), up to that many tokens, are summarized.
+
 Usage:
     redpill-recap.py "/path/to/vtt" "/path/to/summarizations"
 
@@ -11,27 +22,66 @@ Arguments:
 
 import os
 
-import webvtt
 from alive_progress import alive_bar
-from transformers import AutoModelForSeq2SeqLM, AutoTokenizer, pipeline
 
-# Load model and tokenizer with TensorFlow weights.
+from manowhisper.cache import open_cache, pipeline_identity, text_hash
+from manowhisper.extractive import extract_salient
+from manowhisper.inference import length_sorted_batches
+from manowhisper.segment import read_segments
+from manowhisper.vtt import read_text
+from manowhisper.windows import token_windows
+
 model_name = "gmurro/bart-large-finetuned-filtered-spotify-podcast-summ"
-tokenizer = AutoTokenizer.from_pretrained(model_name)
-model = AutoModelForSeq2SeqLM.from_pretrained(model_name, from_tf=True)
-summarizer = pipeline("summarization", model=model, tokenizer=tokenizer)
+
+# Loaded on first use by load_summarizer(), so --help stays fast.
+tokenizer = None
+summarizer = None
 
 # Define a maximum chunk size based on the model's limit.
 MAX_INPUT_TOKENS = 1024
 
+MODES = ["map-reduce", "truncate"]
+DEFAULT_BATCH_SIZE = 8
+DEFAULT_NUM_BEAMS = 4
+# Longest summary of one chunk, in tokens.
+CHUNK_SUMMARY_TOKENS = 150
+# Chunks shorter than this are passed on as they are.
+MIN_SUMMARY_INPUT = 50
+# Reduce rounds before the joined summaries are truncated instead.
+MAX_REDUCE_ROUNDS = 4
+
+
+# Load model and tokenizer with TensorFlow weights.
+def load_summarizer():
+    global tokenizer, summarizer
+    if summarizer is None:
+        from transformers import AutoModelForSeq2SeqLM, AutoTokenizer, pipeline
+
+        tokenizer = AutoTokenizer.from_pretrained(model_name)
+        model = AutoModelForSeq2SeqLM.from_pretrained(model_name, from_tf=True)
+        summarizer = pipeline("summarization", model=model, tokenizer=tokenizer)
+
 
 # Extract and preprocess text from transcripts.
 def extract_text_from_vtt(vtt_file_path):
-    transcript = []
-    for caption in webvtt.read(vtt_file_path):
-        transcript.append(caption.text)
-    full_text = " ".join(transcript)
-    return full_text
+    return read_text(vtt_file_path)
+
+
+# Keep only the most salient sentences, up to budget tokens.
+def extract_salient_text(vtt_file_path, budget):
+    sentences = list(read_segments(vtt_file_path, "sentence").texts)
+    if not sentences:
+        raise ValueError("The transcript has no captions.")
+    lengths = [
+        len(ids) for ids in tokenizer(sentences, add_special_tokens=False)["input_ids"]
+    ]
+    text = extract_salient(sentences, lengths, budget)
+    kept = len(tokenizer(text, add_special_tokens=False)["input_ids"])
+    print(
+        f"Kept {kept:,} of {sum(lengths):,} tokens of "
+        f"{os.path.basename(vtt_file_path)} for summarizing"
+    )
+    return text
 
 
 # Split the transcript into manageable chunks.
@@ -45,45 +95,154 @@ def split_text_into_chunks(text, max_tokens):
     return chunks
 
 
-# Summarize a preprocessed transcript and write the result.
-def summarize_and_write(vtt_file_path, output_file_path, max_input_length=1024):
-    transcript = extract_text_from_vtt(vtt_file_path)
+def generation_options(max_length, num_beams=DEFAULT_NUM_BEAMS):
+    """Deterministic beam search settings for a summary of up to max_length."""
+    return {
+        "max_length": max_length,
+        "min_length": min(50, max_length // 2),
+        "no_repeat_ngram_size": 3,
+        "early_stopping": True,
+        "num_beams": num_beams,
+        "length_penalty": 1.0,
+        "do_sample": False,
+    }
+
+
+def summarize_chunks(
+    chunks, cache=None, batch_size=DEFAULT_BATCH_SIZE, num_beams=DEFAULT_NUM_BEAMS
+):
+    """
+    Summaries of (text, token count) chunks, in order. Chunks are summarized
+    in length-sorted batches; short chunks are kept as they are.
+    """
+    summaries = [text for text, _ in chunks]
+    options = generation_options(CHUNK_SUMMARY_TOKENS, num_beams)
+    pending = [i for i, (_, length) in enumerate(chunks) if length >= MIN_SUMMARY_INPUT]
+    keys = {i: text_hash(chunks[i][0]) for i in pending}
+
+    found = {}
+    if cache is not None and pending:
+        model_id, revision = pipeline_identity(summarizer)
+        model_id = (
+            f"{model_id}:chunk-summary:beams={num_beams}:max={CHUNK_SUMMARY_TOKENS}"
+        )
+        found = cache.get_many(model_id, revision, list(keys.values()))
+    for i in pending:
+        if keys[i] in found:
+            summaries[i] = found[keys[i]]
+    pending = [i for i in pending if keys[i] not in found]
+
+    new_items = []
+    lengths = [chunks[i][1] for i in pending]
+    for batch in length_sorted_batches(lengths, batch_size):
+        batch = [pending[j] for j in batch]
+        outputs = summarizer(
+            [chunks[i][0] for i in batch],
+            batch_size=len(batch),
+            truncation=True,
+            **options,
+        )
+        for i, output in zip(batch, outputs):
+            summaries[i] = output["summary_text"]
+            new_items.append((keys[i], summaries[i]))
+
+    if cache is not None and new_items:
+        cache.put_many(model_id, revision, new_items)
+    return summaries
+
+
+def summarize_map_reduce(
+    transcript,
+    max_input_length=MAX_INPUT_TOKENS,
+    cache=None,
+    batch_size=DEFAULT_BATCH_SIZE,
+    num_beams=DEFAULT_NUM_BEAMS,
+):
+    """
+    Summarize every chunk of the transcript, then summarize the joined chunk
+    summaries, repeating until they fit in one model input.
+    """
+    chunk_tokens = max_input_length - 50
+    text = transcript
+    for _ in range(MAX_REDUCE_ROUNDS):
+        chunks = token_windows(text, tokenizer, chunk_tokens, stride=0)
+        if len(chunks) <= 1:
+            break
+        text = "\n".join(summarize_chunks(chunks, cache, batch_size, num_beams))
+
+    input_length = len(tokenizer(text, truncation=False)["input_ids"])
+    if input_length < MIN_SUMMARY_INPUT:
+        raise ValueError(
+            f"Input too short for meaningful summarization: {input_length} tokens."
+        )
+    max_summary_length = min(input_length - 1, 512)
+    return summarizer(
+        text,
+        truncation=True,
+        **generation_options(max_summary_length, num_beams),
+    )[0]["summary_text"]
+
+
+def summarize_truncated(transcript, max_input_length=MAX_INPUT_TOKENS):
+    """Summarize the start of the transcript that fits in one model input."""
     # Split the transcript into smaller, overlapping chunks.
     chunks = split_text_into_chunks(transcript, max_input_length - 50)
     concatenated_text = "\n".join(chunks)
 
-    try:
-        # Tokenize the concatenated text to determine input length.
-        input_ids = tokenizer(concatenated_text, truncation=False, return_tensors="pt")[
-            "input_ids"
-        ]
-        input_length = input_ids.shape[-1]
-
-        # Ensure max_length is less than input_length for summarization.
-        if input_length < 50:
-            raise ValueError(
-                f"Input too short for meaningful summarization: {input_length} tokens."
-            )
+    # Tokenize the concatenated text to determine input length.
+    input_ids = tokenizer(concatenated_text, truncation=False, return_tensors="pt")[
+        "input_ids"
+    ]
+    input_length = input_ids.shape[-1]
 
-        # Dynamically adjust max_summary_length to fit the input length.
-        max_summary_length = min(
-            input_length - 1, 512
-        )  # Ensure max_length < input_length
+    # Ensure max_length is less than input_length for summarization.
+    if input_length < 50:
+        raise ValueError(
+            f"Input too short for meaningful summarization: {input_length} tokens."
+        )
+
+    # Dynamically adjust max_summary_length to fit the input length.
+    max_summary_length = min(input_length - 1, 512)  # Ensure max_length < input_length
+
+    return summarizer(
+        concatenated_text,
+        truncation=True,
+        max_length=max_summary_length,
+        min_length=min(50, max_summary_length // 2),
+        no_repeat_ngram_size=3,
+        early_stopping=True,
+        num_beams=5,
+        length_penalty=1.0,
+        temperature=0.7,
+        top_k=50,
+        top_p=0.9,
+        do_sample=True,
+    )[0]["summary_text"]
 
-        final_summary = summarizer(
-            concatenated_text,
-            truncation=True,
-            max_length=max_summary_length,
-            min_length=min(50, max_summary_length // 2),
-            no_repeat_ngram_size=3,
-            early_stopping=True,
-            num_beams=5,
-            length_penalty=1.0,
-            temperature=0.7,
-            top_k=50,
-            top_p=0.9,
-            do_sample=True,
-        )[0]["summary_text"]
+
+# Summarize a preprocessed transcript and write the result.
+def summarize_and_write(
+    vtt_file_path,
+    output_file_path,
+    max_input_length=MAX_INPUT_TOKENS,
+    mode="map-reduce",
+    cache=None,
+    batch_size=DEFAULT_BATCH_SIZE,
+    num_beams=DEFAULT_NUM_BEAMS,
+    extractive_budget=None,
+):
+    try:
+        if extractive_budget:
+            transcript = extract_salient_text(vtt_file_path, extractive_budget)
+        else:
+            transcript = extract_text_from_vtt(vtt_file_path)
+
+        if mode == "truncate":
+            final_summary = summarize_truncated(transcript, max_input_length)
+        else:
+            final_summary = summarize_map_reduce(
+                transcript, max_input_length, cache, batch_size, num_beams
+            )
 
     except Exception as e:
         print(f"Error during final summarization for {vtt_file_path}: {str(e)}")
@@ -99,11 +258,21 @@ def summarize_and_write(vtt_file_path, output_file_path, max_input_length=1024):
 
 
 # Process a directory of transcripts with a progress bar.
-def process_vtt_directory(vtt_directory, output_directory):
+def process_vtt_directory(
+    vtt_directory,
+    output_directory,
+    mode="map-reduce",
+    use_cache=True,
+    batch_size=DEFAULT_BATCH_SIZE,
+    num_beams=DEFAULT_NUM_BEAMS,
+    extractive_budget=None,
+):
     if not os.path.exists(output_directory):
         os.makedirs(output_directory)
 
     vtt_files = [f for f in os.listdir(vtt_directory) if f.endswith(".vtt")]
+    load_summarizer()
+    cache = open_cache(use_cache and mode == "map-reduce")
 
     with alive_bar(len(vtt_files), title="Processing WebVTT files", unit="file") as bar:
         for filename in vtt_files:
@@ -117,9 +286,21 @@ def process_vtt_directory(vtt_directory, output_directory):
                 bar()
                 continue
 
-            summarize_and_write(vtt_file_path, output_file_path)
+            summarize_and_write(
+                vtt_file_path,
+                output_file_path,
+                mode=mode,
+                cache=cache,
+                batch_size=batch_size,
+                num_beams=num_beams,
+                extractive_budget=extractive_budget,
+            )
             bar()
 
+    if cache:
+        print(cache.stats())
+        cache.close()
+
 
 if __name__ == "__main__":
     import argparse
@@ -133,6 +314,45 @@ if __name__ == "__main__":
     parser.add_argument(
         "output_directory", type=str, help="Path to the directory to save summaries"
     )
+    parser.add_argument(
+        "--mode",
+        choices=MODES,
+        default="map-reduce",
+        help="Summarize every chunk and then the chunk summaries, or only the "
+        "first model input of each transcript (default: map-reduce)",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=DEFAULT_BATCH_SIZE,
+        help=f"Chunks per summarizer call (default: {DEFAULT_BATCH_SIZE})",
+    )
+    parser.add_argument(
+        "--num-beams",
+        type=int,
+        default=DEFAULT_NUM_BEAMS,
+        help=f"Beams for map-reduce summaries (default: {DEFAULT_NUM_BEAMS})",
+    )
+    parser.add_argument(
+        "--no-cache",
+        dest="cache",
+        action="store_false",
+        help="Summarize every chunk instead of reusing cached chunk summaries",
+    )
+    parser.add_argument(
+        "--extractive-budget",
+        type=int,
+        help="Summarize only the most salient sentences, up to this many tokens "
+        "(for example 3000); by default the whole transcript is summarized",
+    )
 
     args = parser.parse_args()
-    process_vtt_directory(args.vtt_directory, args.output_directory)
+    process_vtt_directory(
+        args.vtt_directory,
+        args.output_directory,
+        args.mode,
+        args.cache,
+        args.batch_size,
+        args.num_beams,
+        args.extractive_budget,
+    )
@@ -2,52 +2,36 @@ import os
 from datetime import datetime
 
 import click
+import numpy as np
 import plotly.graph_objects as go
-import webvtt
 from alive_progress import alive_bar
-from transformers import pipeline
 
+from manowhisper.backends import BACKENDS
+from manowhisper.cache import open_cache
+from manowhisper.inference import DEFAULT_BATCH_SIZE, classify_batched
+from manowhisper.models import load_pipeline
+from manowhisper.scorestore import ScoreStore, score_matrix
+from manowhisper.segment import SEGMENT_MODES, read_segments
 
-def parse_vtt_file(vtt_file):
+
+def parse_vtt_file(vtt_file, segment="caption"):
     """
-    Parse a WebVTT file to extract sentences and their start times.
+    Parse a WebVTT file to extract sentences and their start times in seconds.
     """
-    sentences = []
-    timestamps = []
-
-    for caption in webvtt.read(vtt_file):
-        sentences.append(caption.text.strip().replace("\n", " "))
-        timestamps.append(caption.start)
+    segments = read_segments(vtt_file, segment)
+    return segments.texts, segments.starts
 
-    return sentences, timestamps
 
+LABELS = ["hate", "nothate"]
 
-def classify_hate(sentences, model_pipeline):
-    """Classifies hate and nothate scores for each sentence."""
-    hate_scores = []
-    not_hate_scores = []
 
+def classify_hate(sentences, model_pipeline, batch_size=DEFAULT_BATCH_SIZE, cache=None):
+    """Score each sentence as hate and nothate, one column per label."""
     with alive_bar(len(sentences), title="Processing Sentences") as bar:
-        for sentence in sentences:
-            result = model_pipeline(sentence)
-
-            # Default scores.
-            hate_score = 0
-            not_hate_score = 0
-
-            # Extract scores based on label.
-            for entry in result:
-                if entry["label"] == "hate":
-                    # Negative for hate.
-                    hate_score = -entry["score"]
-                elif entry["label"] == "nothate":
-                    not_hate_score = entry["score"]
-
-            hate_scores.append(hate_score)
-            not_hate_scores.append(not_hate_score)
-            bar()
-
-    return hate_scores, not_hate_scores
+        results = classify_batched(
+            sentences, model_pipeline, batch_size, bar=bar, cache=cache
+        )
+    return score_matrix(results, LABELS)
 
 
 def plot_dual_axis_chart(
@@ -56,10 +40,7 @@ def plot_dual_axis_chart(
     """Generate a dual-axis area chart with Plotly."""
 
     # Convert timestamps to minutes.
-    time_in_minutes = [
-        sum(float(x) * 60**i for i, x in enumerate(reversed(ts.split(":")))) / 60
-        for ts in timestamps
-    ]
+    time_in_minutes = [start / 60 for start in timestamps]
 
     # Create the chart.
     fig = go.Figure()
@@ -144,17 +125,72 @@ def plot_dual_axis_chart(
 @click.option(
     "--title", "-t", default="Hate Speech Analysis Chart", help="Title of the chart"
 )
-def main(input_vtt_file, output_html_file, title):
+@click.option(
+    "--batch-size",
+    default=DEFAULT_BATCH_SIZE,
+    show_default=True,
+    help="Sentences per model forward pass",
+)
+@click.option(
+    "--cache/--no-cache",
+    default=True,
+    show_default=True,
+    help="Reuse scores from the shared classification cache",
+)
+@click.option(
+    "--backend",
+    type=click.Choice(BACKENDS),
+    default="torch",
+    show_default=True,
+    help="CPU inference backend",
+)
+@click.option(
+    "--segment",
+    type=click.Choice(SEGMENT_MODES),
+    default="caption",
+    show_default=True,
+    help="Classify captions as-is, or merged into sentences",
+)
+@click.option(
+    "--rescore",
+    is_flag=True,
+    help="Run the model even if the score store has this episode",
+)
+def main(
+    input_vtt_file,
+    output_html_file,
+    title,
+    batch_size,
+    cache,
+    backend,
+    segment,
+    rescore,
+):
     """
     Generate a dual-axis chart of hate scores for a given WebVTT transcript.
     """
-    sentences, timestamps = parse_vtt_file(input_vtt_file)
-
-    model_pipeline = pipeline(
-        "text-classification", model="facebook/roberta-hate-speech-dynabench-r4-target"
-    )
-
-    hate_scores, not_hate_scores = classify_hate(sentences, model_pipeline)
+    sentences, timestamps = parse_vtt_file(input_vtt_file, segment)
+
+    store = ScoreStore("hate", backend, segment)
+    scores = None if rescore else store.load(input_vtt_file, LABELS)
+    if scores is None:
+        model_pipeline = load_pipeline("hate", backend)
+        cache = open_cache(cache)
+
+        scores = store.save(
+            input_vtt_file,
+            LABELS,
+            classify_hate(sentences, model_pipeline, batch_size, cache),
+        )
+        if cache:
+            print(cache.stats())
+            cache.close()
+    else:
+        print(f"Using stored scores from {store.directory}")
+
+    # Negative for hate.
+    hate_scores = -scores[:, 0].astype(np.float32)
+    not_hate_scores = scores[:, 1].astype(np.float32)
 
     plot_dual_axis_chart(
         timestamps, hate_scores, not_hate_scores, output_html_file, title
@@ -3,48 +3,48 @@ from datetime import datetime
 
 import click
 import plotly.graph_objects as go
-import webvtt
 from alive_progress import alive_bar
-from transformers import pipeline
+
+from manowhisper.backends import BACKENDS
+from manowhisper.cache import open_cache
+from manowhisper.corpus import list_transcripts, read_transcript
+from manowhisper.estimate import (
+    DEFAULT_CI_WIDTH,
+    DEFAULT_CONFIDENCE,
+    describe_estimate,
+    estimate_proportion,
+)
+from manowhisper.inference import DEFAULT_BATCH_SIZE, classify_batched
+from manowhisper.models import load_pipeline
 
 
 def parse_vtt_files(input_path):
     """
     Parse WebVTT files to extract sentences and timestamps.
 
-    Handles both a directory of VTT files and a single VTT file.
+    Handles a directory of VTT files, a single VTT file, or a corpus store.
     """
     sentences = []
     filenames = []
 
-    if os.path.isdir(input_path):
-        vtt_files = [
-            os.path.join(input_path, f)
-            for f in os.listdir(input_path)
-            if f.endswith(".vtt")
-        ]
-    elif os.path.isfile(input_path) and input_path.endswith(".vtt"):
-        vtt_files = [input_path]
-    else:
-        raise ValueError("Input must be a directory or a .vtt file.")
-
-    for filepath in vtt_files:
-        for caption in webvtt.read(filepath):
-            sentences.append(caption.text.strip().replace("\n", " "))
-            filenames.append(os.path.basename(filepath))
+    for filepath in list_transcripts(input_path):
+        texts = read_transcript(filepath).texts
+        sentences.extend(texts)
+        filenames.extend([os.path.basename(filepath)] * len(texts))
 
     return sentences, filenames
 
 
-def classify_hate(sentences, model_pipeline):
+def classify_hate(sentences, model_pipeline, batch_size=DEFAULT_BATCH_SIZE, cache=None):
     """Classifies hate and nothate scores for each sentence."""
     hate_scores = []
     labels = []
 
     with alive_bar(len(sentences), title="Processing Sentences") as bar:
-        for sentence in sentences:
-            result = model_pipeline(sentence)
-
+        results = classify_batched(
+            sentences, model_pipeline, batch_size, bar=bar, cache=cache
+        )
+        for result in results:
             # Default scores and label.
             hate_score = 0
             label = "nothate"
@@ -60,17 +60,20 @@ def classify_hate(sentences, model_pipeline):
 
             hate_scores.append(hate_score)
             labels.append(label)
-            bar()
 
     return hate_scores, labels
 
 
-def plot_pie_chart(labels, sentences, output_filename, title):
-    """Generate a pie chart with Plotly."""
+def plot_pie_chart(labels, sentences, output_filename, title, estimate=None):
+    """Generate a pie chart with Plotly, from labels or a sampled estimate."""
 
-    # Count hate and not hate occurrences.
-    hate_count = labels.count("hate")
-    not_hate_count = labels.count("nothate")
+    if estimate is None:
+        # Count hate and not hate occurrences.
+        hate_count = labels.count("hate")
+        not_hate_count = labels.count("nothate")
+    else:
+        hate_count = estimate.proportion
+        not_hate_count = 1 - estimate.proportion
 
     # Data for pie chart.
     values = [hate_count, not_hate_count]
@@ -94,6 +97,8 @@ def plot_pie_chart(labels, sentences, output_filename, title):
     footer_text = (
         f"Generated: {timestamp}<br />Sentences classified: {total_sentences:,}"
     )
+    if estimate is not None:
+        footer_text = f"Generated: {timestamp}<br />{describe_estimate(estimate)}"
 
     fig.update_layout(
         title={
@@ -132,7 +137,55 @@ def plot_pie_chart(labels, sentences, output_filename, title):
 @click.option(
     "--title", "-t", default="Hate Speech Analysis Chart", help="Title of the chart"
 )
-def main(input_path, output_html_file, title):
+@click.option(
+    "--batch-size",
+    default=DEFAULT_BATCH_SIZE,
+    show_default=True,
+    help="Sentences per model forward pass",
+)
+@click.option(
+    "--cache/--no-cache",
+    default=True,
+    show_default=True,
+    help="Reuse scores from the shared classification cache",
+)
+@click.option(
+    "--backend",
+    type=click.Choice(BACKENDS),
+    default="torch",
+    show_default=True,
+    help="CPU inference backend",
+)
+@click.option(
+    "--estimate",
+    is_flag=True,
+    help="Classify a stratified sample of sentences instead of all of them",
+)
+@click.option(
+    "--ci-width",
+    default=DEFAULT_CI_WIDTH,
+    show_default=True,
+    help="With --estimate, sample until the confidence interval is this narrow",
+)
+@click.option(
+    "--confidence",
+    default=DEFAULT_CONFIDENCE,
+    show_default=True,
+    help="Confidence level of the --estimate interval",
+)
+@click.option("--seed", type=int, help="Random seed for --estimate sampling")
+def main(
+    input_path,
+    output_html_file,
+    title,
+    batch_size,
+    cache,
+    backend,
+    estimate,
+    ci_width,
+    confidence,
+    seed,
+):
     """
     Generate a pie chart of hate vs not hate classifications for WebVTT transcripts.
 
@@ -140,13 +193,31 @@ def main(input_path, output_html_file, title):
     """
     sentences, filenames = parse_vtt_files(input_path)
 
-    model_pipeline = pipeline(
-        "text-classification", model="facebook/roberta-hate-speech-dynabench-r4-target"
-    )
+    model_pipeline = load_pipeline("hate", backend)
+    cache = open_cache(cache)
+
+    if estimate:
+
+        def is_hate(texts):
+            return [
+                label == "hate"
+                for label in classify_hate(texts, model_pipeline, batch_size, cache)[1]
+            ]
 
-    hate_scores, labels = classify_hate(sentences, model_pipeline)
+        prevalence = estimate_proportion(
+            sentences, filenames, is_hate, ci_width, confidence, seed
+        )
+        labels = None
+    else:
+        prevalence = None
+        hate_scores, labels = classify_hate(
+            sentences, model_pipeline, batch_size, cache
+        )
+    if cache:
+        print(cache.stats())
+        cache.close()
 
-    plot_pie_chart(labels, sentences, output_html_file, title)
+    plot_pie_chart(labels, sentences, output_html_file, title, prevalence)
 
 
 if __name__ == "__main__":
@@ -5,60 +5,48 @@ from datetime import datetime
 import click
 import numpy as np
 import plotly.graph_objects as go
-import webvtt
-from transformers import pipeline
 
+from manowhisper.backends import BACKENDS
+from manowhisper.cache import open_cache
+from manowhisper.inference import DEFAULT_BATCH_SIZE, classify_batched
+from manowhisper.models import EMOTION_LABELS, load_pipeline
+from manowhisper.scorestore import ScoreStore, score_matrix
+from manowhisper.segment import SEGMENT_MODES, read_segments
 
-def parse_vtt_file(vtt_file):
+
+def parse_vtt_file(vtt_file, segment="caption"):
     """
-    Parse a WebVTT file to extract sentences and their start times.
+    Parse a WebVTT file to extract sentences and their start times in seconds.
     """
-    sentences = []
-    timestamps = []
-
-    for caption in webvtt.read(vtt_file):
-        sentences.append(caption.text.strip().replace("\n", " "))
-        timestamps.append(caption.start)
+    segments = read_segments(vtt_file, segment)
+    return segments.texts, segments.starts
 
-    return sentences, timestamps
 
-
-def classify_emotions(sentences, model_pipeline):
-    """Classifies emotions for each sentence."""
-    emotion_scores = []
-    for sentence in sentences:
-        result = model_pipeline(sentence)
-        if isinstance(result, list) and isinstance(result[0], dict):
-            emotion_scores.append({entry["label"]: entry["score"] for entry in result})
-        else:
+def classify_emotions(
+    sentences, model_pipeline, batch_size=DEFAULT_BATCH_SIZE, cache=None
+):
+    """Score every emotion for each sentence, one column per label."""
+    results = classify_batched(sentences, model_pipeline, batch_size, cache=cache)
+    for sentence, result in zip(sentences, results):
+        if not (isinstance(result, list) and isinstance(result[0], dict)):
             print(f"Unexpected output for sentence: {sentence}")
-            emotion_scores.append({})
 
-    return emotion_scores
+    return score_matrix(results, EMOTION_LABELS)
 
 
 def plot_emotions_over_time(timestamps, emotion_scores, output_filename, title):
     """Generate heatmap with plotly."""
 
     # Convert timestamps to minutes
-    time_in_minutes = [
-        sum(float(x) * 60**i for i, x in enumerate(reversed(ts.split(":")))) / 60
-        for ts in timestamps
-    ]
+    time_in_minutes = [start / 60 for start in timestamps]
 
-    # Extract emotion labels and organize data into a 2D array.
-    emotion_labels = [
-        "anger",
-        "disgust",
-        "fear",
-        "joy",
-        "neutral",
-        "sadness",
-        "surprise",
-    ]
-    heatmap_data = []
-    for label in emotion_labels:
-        heatmap_data.append([score_dict.get(label, 0) for score_dict in emotion_scores])
+    # Show only each sentence's top emotion, one row per label.
+    emotion_scores = np.asarray(emotion_scores, dtype=np.float32)
+    rows = np.arange(len(emotion_scores))
+    top = emotion_scores.argmax(axis=1) if len(emotion_scores) else rows
+    heatmap_data = np.zeros_like(emotion_scores)
+    heatmap_data[rows, top] = emotion_scores[rows, top]
+    heatmap_data = heatmap_data.T
 
     custom_colorscale = [
         [0.0, "#FFFFFF"],
@@ -74,7 +62,7 @@ def plot_emotions_over_time(timestamps, emotion_scores, output_filename, title):
         data=go.Heatmap(
             z=heatmap_data,
             x=time_in_minutes,
-            y=emotion_labels,
+            y=EMOTION_LABELS,
             colorscale=custom_colorscale,
             colorbar=dict(title="Emotion Score"),
         )
@@ -132,18 +120,69 @@ def plot_emotions_over_time(timestamps, emotion_scores, output_filename, title):
 @click.argument("input_vtt_file", type=click.Path(exists=True, readable=True))
 @click.argument("output_html_file", type=click.Path())
 @click.option("--title", "-t", default="Emotion Heatmap", help="Title of the heatmap")
-def main(input_vtt_file, output_html_file, title):
+@click.option(
+    "--batch-size",
+    default=DEFAULT_BATCH_SIZE,
+    show_default=True,
+    help="Sentences per model forward pass",
+)
+@click.option(
+    "--cache/--no-cache",
+    default=True,
+    show_default=True,
+    help="Reuse scores from the shared classification cache",
+)
+@click.option(
+    "--backend",
+    type=click.Choice(BACKENDS),
+    default="torch",
+    show_default=True,
+    help="CPU inference backend",
+)
+@click.option(
+    "--segment",
+    type=click.Choice(SEGMENT_MODES),
+    default="caption",
+    show_default=True,
+    help="Classify captions as-is, or merged into sentences",
+)
+@click.option(
+    "--rescore",
+    is_flag=True,
+    help="Run the model even if the score store has this episode",
+)
+def main(
+    input_vtt_file,
+    output_html_file,
+    title,
+    batch_size,
+    cache,
+    backend,
+    segment,
+    rescore,
+):
     """
     Generate a heatmap of emotions for a given WebVTT transcript.
     """
 
-    sentences, timestamps = parse_vtt_file(input_vtt_file)
+    sentences, timestamps = parse_vtt_file(input_vtt_file, segment)
 
-    model_pipeline = pipeline(
-        "text-classification", model="j-hartmann/emotion-english-distilroberta-base"
-    )
+    store = ScoreStore("emotion", backend, segment)
+    emotion_scores = None if rescore else store.load(input_vtt_file, EMOTION_LABELS)
+    if emotion_scores is None:
+        model_pipeline = load_pipeline("emotion", backend)
+        cache = open_cache(cache)
 
-    emotion_scores = classify_emotions(sentences, model_pipeline)
+        emotion_scores = store.save(
+            input_vtt_file,
+            EMOTION_LABELS,
+            classify_emotions(sentences, model_pipeline, batch_size, cache),
+        )
+        if cache:
+            print(cache.stats())
+            cache.close()
+    else:
+        print(f"Using stored scores from {store.directory}")
 
     plot_emotions_over_time(timestamps, emotion_scores, output_html_file, title)
 
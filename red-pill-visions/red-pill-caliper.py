@@ -4,16 +4,9 @@ from datetime import datetime
 
 import click
 import plotly.express as px
-import webvtt
 from alive_progress import alive_bar
 
-
-def extract_text_from_vtt(vtt_file_path):
-    """Extract text from a VTT file."""
-    transcript = []
-    for caption in webvtt.read(vtt_file_path):
-        transcript.append(caption.text)
-    return " ".join(transcript)
+from manowhisper.corpus import list_transcripts, read_transcript
 
 
 def calculate_metrics(text, episode_length_minutes):
@@ -84,19 +77,18 @@ def generate_histogram(data, metric_name, x_label, title, output_file):
 
 def process_vtt_directory(vtt_directory, podcast_name):
     """Process a directory of WebVTT files."""
-    files = [f for f in os.listdir(vtt_directory) if f.endswith(".vtt")]
+    files = list_transcripts(vtt_directory)
 
     results = []
 
     with alive_bar(len(files), title="Processing episodes", unit="episode") as bar:
-        for file in files:
-            vtt_path = os.path.join(vtt_directory, file)
-            base_name = os.path.splitext(file)[0]
-
-            # Extract text and episode length.
-            text = extract_text_from_vtt(vtt_path)
-            captions = list(webvtt.read(vtt_path))
-            episode_length_seconds = captions[-1].end_in_seconds if captions else 0
+        for vtt_path in files:
+            base_name = os.path.splitext(os.path.basename(vtt_path))[0]
+
+            # Extract text and episode length from a single parse.
+            captions = read_transcript(vtt_path)
+            text = " ".join(captions.texts)
+            episode_length_seconds = captions.ends[-1] if len(captions.ends) else 0
             episode_length_minutes = episode_length_seconds / 60
 
             # Calculate metrics.
@@ -1,15 +1,22 @@
-import os
 from datetime import datetime
 
 import click
 import matplotlib.pyplot as plt
 import nltk
-import webvtt
 from alive_progress import alive_bar
 from nltk.corpus import stopwords
 from wordcloud import WordCloud
 
-nltk.download("stopwords")
+from manowhisper.corpus import list_transcripts, read_transcript
+
+
+def english_stopwords():
+    """NLTK's English stopwords, downloaded only if missing."""
+    try:
+        nltk.data.find("corpora/stopwords")
+    except LookupError:
+        nltk.download("stopwords")
+    return set(stopwords.words("english"))
 
 
 def generate_wordcloud(
@@ -60,7 +67,7 @@ def generate_wordcloud(
 
 
 def process_vtt_files(directory, additional_stopwords=None):
-    stop_words = set(stopwords.words("english"))
+    stop_words = english_stopwords()
 
     # Merge additional stopwords if provided.
     if additional_stopwords:
@@ -68,19 +75,16 @@ def process_vtt_files(directory, additional_stopwords=None):
 
     # Collect text from all VTT files in directory.
     full_text = []
-    vtt_files = [f for f in os.listdir(directory) if f.endswith(".vtt")]
+    vtt_files = list_transcripts(directory)
     file_count = len(vtt_files)
 
     # Use alive-progress to show progress.
     with alive_bar(file_count, title="Processing VTT Files") as bar:
-        for filename in vtt_files:
-            vtt_path = os.path.join(directory, filename)
-            for caption in webvtt.read(vtt_path):
+        for vtt_path in vtt_files:
+            for text in read_transcript(vtt_path).texts:
                 # Split caption text into words and remove stopwords.
                 words = [
-                    word
-                    for word in caption.text.split()
-                    if word.lower() not in stop_words
+                    word for word in text.split() if word.lower() not in stop_words
                 ]
                 # Join filtered words back to text and add to corpus.
                 full_text.append(" ".join(words))
@@ -113,7 +117,7 @@ def main(vtt_directory, output_image, width, height, title, additional_stopwords
     text_corpus, file_count = process_vtt_files(vtt_directory, additional_stopwords)
 
     # Generate wordcloud.
-    stop_words = set(stopwords.words("english"))
+    stop_words = english_stopwords()
     if additional_stopwords:
         stop_words.update(additional_stopwords)
 
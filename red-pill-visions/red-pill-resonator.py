@@ -7,10 +7,11 @@ from datetime import datetime
 import click
 import numpy as np
 import plotly.graph_objects as go
-import webvtt
 from alive_progress import alive_bar
 from plotly.subplots import make_subplots
 
+from manowhisper.corpus import default_store_path, list_transcripts, read_transcript
+
 
 def count_keywords_across_podcasts(podcast_paths, keywords):
     """
@@ -19,31 +20,27 @@ def count_keywords_across_podcasts(podcast_paths, keywords):
     podcast_counts = defaultdict(lambda: defaultdict(int))
     episode_counts = {}
 
+    # List each podcast's transcripts once.
+    podcast_files = {}
+    for podcast, directory in podcast_paths.items():
+        if not os.path.exists(directory):
+            print(f"Warning: Directory {directory} does not exist. Skipping...")
+            continue
+        podcast_files[podcast] = list_transcripts(directory)
+
     # Calculate total tasks (podcasts and their WebVTT files).
-    total_files = sum(
-        [
-            len([f for f in os.listdir(directory) if f.endswith(".vtt")])
-            for directory in podcast_paths.values()
-        ]
-    )
+    total_files = sum(len(files) for files in podcast_files.values())
 
     # Initialize the progress bar for all files.
     with alive_bar(total_files, title="Processing podcasts and episodes") as bar:
-        for podcast, directory in podcast_paths.items():
-            if not os.path.exists(directory):
-                print(f"Warning: Directory {directory} does not exist. Skipping...")
-                continue
-
-            files = [f for f in os.listdir(directory) if f.endswith(".vtt")]
+        for podcast, files in podcast_files.items():
             # Count episodes.
             episode_counts[podcast] = len(files)
 
-            for filename in files:
-                vtt_path = os.path.join(directory, filename)
-
+            for vtt_path in files:
                 # Process each caption in the transcript.
-                for caption in webvtt.read(vtt_path):
-                    text = caption.text.lower()
+                for text in read_transcript(vtt_path).texts:
+                    text = text.lower()
                     words = text.split()
 
                     for keyword in keywords:
@@ -202,7 +199,12 @@ def plot_keyword_trends_across_podcasts(
     show_default=True,
     help="Title of the graph.",
 )
-def main(output_image, keywords, width, height, title, mode):
+@click.option(
+    "--packed",
+    is_flag=True,
+    help="Read each podcast's packed corpus store instead of its vtt directory.",
+)
+def main(output_image, keywords, width, height, title, mode, packed):
     """
     Generate keyword frequency graphs across a corpus of WebVTT files.
 
@@ -262,6 +264,12 @@ def main(output_image, keywords, width, height, title, mode):
         ),
     }
 
+    if packed:
+        podcast_paths = {
+            podcast: default_store_path(directory)
+            for podcast, directory in podcast_paths.items()
+        }
+
     keywords = keywords.split(",")
 
     podcast_counts, episode_counts = count_keywords_across_podcasts(